@@ -1,18 +1,139 @@
-from flask import Flask, request, jsonify
+import io
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, abort, g, request, jsonify, send_file
 from flask_cors import CORS  # ✅ Add this line
+from werkzeug.datastructures import FileStorage
 
-from utils.internet import has_internet
-from utils.audio_utils import transcribe_audio
+from utils.settings import settings  # first: loads .env before other utils read their tunables
+from utils.health import health_monitor
+from utils.audio_utils import transcribe_audio, transcript_cache
 from utils.image_utils import analyze_image_with_gemini
-from utils.prompt_utils import build_prompt
-from utils.ai_handler import get_ai_response
-from utils.weather_utils import get_weather
-from dotenv import load_dotenv
-load_dotenv() 
+from utils.prompt_utils import assemble_prompt, summarize_inputs
+from utils.ai_handler import get_ai_response, stream_ai_response, is_error
+from utils.weather_utils import get_weather, weather_cache
+from utils.semantic_cache import response_cache
+from utils.image_cache import get_diagnosis_cache
+from utils.http_client import pool_stats
+from utils.image_preprocess import preprocess_stats, ImageRejected
+from utils.jobs import job_queue, QueueFull
+from utils.limiter import limiter_stats
+from utils import metrics, profiling
 
 app = Flask(__name__)
 CORS(app)  # ✅ Enable CORS for all routes and origins
 
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+    # Probes the uplink, OpenRouter and Ollama in the background so LLM routing
+    # never has to discover an outage on a farmer's request. Started on the
+    # first request, not at import, so importing app (tests, scripts, the
+    # reloader's parent process) doesn't spawn a probing thread.
+    health_monitor.start()
+
+@app.after_request
+def record_request(response):
+    # For the SSE endpoint this is time to the first byte; the stream's
+    # own stage timings are recorded when it finishes.
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        metrics.request_seconds.observe(
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=str(response.status_code),
+        )
+    return response
+
+# Transcription, image analysis and weather don't depend on each other,
+# so they run side by side on a shared, bounded pool.
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "12"))
+stage_pool = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="farmer-stage")
+
+
+# Field surveys send dozens of photos at once; Gemini calls for a batch are
+# capped separately so one survey can't starve regular farmer requests.
+GEMINI_BATCH_CONCURRENCY = int(os.getenv("GEMINI_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "64"))
+batch_pool = ThreadPoolExecutor(max_workers=GEMINI_BATCH_CONCURRENCY, thread_name_prefix="gemini-batch")
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed milliseconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def gather_inputs(city, audio, image):
+    """Run the independent input stages concurrently; return (results, timings)."""
+    futures = {"weather": stage_pool.submit(profiling.bind(timed, "weather"), get_weather, city or "")}
+    if audio:
+        futures["audio"] = stage_pool.submit(profiling.bind(timed, "audio"), transcribe_audio, audio)
+    if image:
+        futures["image"] = stage_pool.submit(profiling.bind(timed, "image"), analyze_image_with_gemini, image)
+
+    results, timings = {}, {}
+    for stage, future in futures.items():
+        try:
+            results[stage], timings[stage] = future.result()
+        except Exception:
+            metrics.stage_errors.inc(stage=stage)
+            raise
+    return results, timings
+
+
+def sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def run_farmer_agent(text, city, lang, audio=None, image=None, progress=None):
+    """The full pipeline behind /farmer-agent; progress(stage) is called as each stage starts."""
+    progress = progress or (lambda stage: None)
+    started = time.perf_counter()
+
+    progress("inputs")
+    with profiling.span("inputs"):
+        results, timings = gather_inputs(city, audio, image)
+    audio_text = results.get("audio", "")
+    image_desc = results.get("image", "")
+    weather = results["weather"]
+    timings["inputs"] = round((time.perf_counter() - started) * 1000, 1)
+
+    progress("prompt")
+    with profiling.span("prompt") as span:
+        (prompt, prompt_stats), timings["prompt"] = timed(assemble_prompt, text, audio_text, image_desc, weather, lang)
+        query = summarize_inputs(text, audio_text, image_desc)
+        span.set(prompt_tokens=prompt_stats["prompt_tokens"], trimmed=prompt_stats["trimmed"])
+    progress("llm")
+    with profiling.span("llm"):
+        response, timings["llm"] = timed(get_ai_response, prompt, True, lang, query=query, weather=weather)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    metrics.observe_timings(timings, lang)
+    metrics.prompt_tokens.observe(prompt_stats["prompt_tokens"], lang=metrics.lang_label(lang))
+    if is_error(response):
+        metrics.stage_errors.inc(stage="llm")
+
+    return {
+        "city": city,
+        "weather": weather,
+        "ai_response": response,
+        "input_used": {
+            "text": text,
+            "audio_text": audio_text,
+            "image_description": image_desc
+        },
+        "prompt_stats": prompt_stats,
+        "timings_ms": timings
+    }
+
+
 @app.route("/farmer-agent", methods=["POST"])
 def farmer_agent():
     try:
@@ -23,25 +144,215 @@ def farmer_agent():
         audio = request.files.get("audio")
         image = request.files.get("image")
 
-        audio_text = transcribe_audio(audio) if audio else ""
-        image_desc = analyze_image_with_gemini(image) if image else ""
-        weather = get_weather(city or "")
-        prompt = build_prompt(text, audio_text, image_desc, weather, lang)
-        response = get_ai_response(prompt, True , lang)
+        # Send "X-Profile: <PROFILE_TOKEN>" (or set PROFILE_SAMPLE_RATE) to get
+        # a span tree and CPU profile of this request at /profiles/<X-Profile-Id>.
+        with profiling.profile_request(request.headers, "/farmer-agent") as session:
+            result = run_farmer_agent(text, city, lang, audio, image)
+            with profiling.span("jsonify"):
+                response = jsonify(result)
+        if session:
+            response.headers["X-Profile-Id"] = session.id
+        return response
+
+    except ImageRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def detach_upload(upload):
+    """Copy an upload into memory; the request's file handles are closed once it returns."""
+    if not upload:
+        return None
+    return FileStorage(stream=io.BytesIO(upload.read()), filename=upload.filename,
+                       content_type=upload.content_type)
+
+
+@app.route("/farmer-agent/jobs", methods=["POST"])
+def submit_farmer_job():
+    """
+    Same inputs as /farmer-agent, answered asynchronously: returns 202 with a
+    job id to poll at GET /farmer-agent/jobs/<id>. Send an Idempotency-Key
+    header (or form field) so a retried submit returns the original job.
+    """
+    try:
+        text = request.form.get("text")
+        city = request.form.get("city")
+        lang = request.form.get("lang", "en")
+        key = request.headers.get("Idempotency-Key") or request.form.get("idempotency_key")
+
+        audio = detach_upload(request.files.get("audio"))
+        image = detach_upload(request.files.get("image"))
+
+        job, created = job_queue.submit(run_farmer_agent, text, city, lang, audio, image, idempotency_key=key)
+    except QueueFull as e:
+        return jsonify({"error": f"Server busy: {e}"}), 503, {"Retry-After": "5"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    job["status_url"] = f"/farmer-agent/jobs/{job['job_id']}"
+    return jsonify(job), 202 if created else 200
+
+
+@app.route("/farmer-agent/jobs/<job_id>", methods=["GET"])
+def farmer_job_status(job_id):
+    """Status, current stage and (once done) the same body /farmer-agent returns."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
+
+
+@app.route("/farmer-agent/stream", methods=["POST"])
+def farmer_agent_stream():
+    """
+    Same inputs as /farmer-agent, but answers as server-sent events:
+    one "meta" event (weather, inputs used), a "token" event per chunk of
+    the LLM answer as it is generated, then a "done" event with timings.
+    """
+    try:
+        started = time.perf_counter()
+        text = request.form.get("text")
+        city = request.form.get("city")
+        lang = request.form.get("lang", "en")
+        online = request.form.get("online", "true").lower() != "false"
+
+        audio = request.files.get("audio")
+        image = request.files.get("image")
+
+        results, timings = gather_inputs(city, audio, image)
+        audio_text = results.get("audio", "")
+        image_desc = results.get("image", "")
+        weather = results["weather"]
+        timings["inputs"] = round((time.perf_counter() - started) * 1000, 1)
+
+        (prompt, prompt_stats), timings["prompt"] = timed(assemble_prompt, text, audio_text, image_desc, weather, lang)
+        query = summarize_inputs(text, audio_text, image_desc)
+        metrics.prompt_tokens.observe(prompt_stats["prompt_tokens"], lang=metrics.lang_label(lang))
+
+    except ImageRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify({
+    def generate():
+        yield sse("meta", {
             "city": city,
             "weather": weather,
-            "ai_response": response,
             "input_used": {
                 "text": text,
                 "audio_text": audio_text,
                 "image_description": image_desc
-            }
+            },
+            "prompt_stats": prompt_stats
         })
+        llm_start = time.perf_counter()
+        for token in stream_ai_response(prompt, online, lang, query=query, weather=weather):
+            if "first_token" not in timings:
+                timings["first_token"] = round((time.perf_counter() - started) * 1000, 1)
+            yield sse("token", {"text": token})
+        timings["llm"] = round((time.perf_counter() - llm_start) * 1000, 1)
+        timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        metrics.observe_timings(timings, lang)
+        yield sse("done", {"timings_ms": timings})
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # stop nginx from buffering the stream
+    })
 
+def diagnose_one(image):
+    try:
+        diagnosis, elapsed = timed(analyze_image_with_gemini, image)
+        return {"filename": image.filename, "diagnosis": diagnosis, "ms": elapsed}
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return {"filename": image.filename, "error": str(e)}
+
+
+@app.route("/farmer-agent/diagnose-batch", methods=["POST"])
+def diagnose_batch():
+    """
+    Diagnose many crop photos (form field "images", repeated) in one call.
+    Photos fan out to Gemini with at most GEMINI_BATCH_CONCURRENCY in flight;
+    results come back in upload order with overall images/sec.
+    """
+    images = [image for image in request.files.getlist("images") if image]
+    if not images:
+        return jsonify({"error": "No images uploaded"}), 400
+    if len(images) > BATCH_MAX_IMAGES:
+        return jsonify({"error": f"Too many images ({len(images)}), limit is {BATCH_MAX_IMAGES}"}), 413
+
+    started = time.perf_counter()
+    results = list(batch_pool.map(diagnose_one, images))
+    elapsed = time.perf_counter() - started
+
+    return jsonify({
+        "results": results,
+        "images": len(images),
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(len(images) / elapsed, 2) if elapsed > 0 else None
+    })
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Latest provider probes and the OpenRouter circuit-breaker state."""
+    return jsonify(health_monitor.snapshot())
+
+@app.route("/http-stats", methods=["GET"])
+def http_stats():
+    """Upstream connection-pool usage and per-host request counters."""
+    return jsonify(pool_stats())
+
+@app.route("/image-stats", methods=["GET"])
+def image_stats():
+    """Bytes saved by shrinking crop photos before they are sent to Gemini."""
+    return jsonify(preprocess_stats())
+
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters for the in-process caches."""
+    return jsonify({
+        "weather": weather_cache.stats(),
+        "semantic": response_cache.stats(),
+        "image": get_diagnosis_cache().stats(),
+        "transcripts": transcript_cache.stats()
+    })
+
+@app.route("/metrics", methods=["GET"])
+def metrics_route():
+    """Prometheus text format: stage latencies, payload sizes, upstream calls and limiter queues."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/limiter-stats", methods=["GET"])
+def limiter_stats_route():
+    """Per-provider slots in use, queue depth, waits and rejections."""
+    return jsonify(limiter_stats())
+
+@app.route("/job-stats", methods=["GET"])
+def job_stats():
+    """Job queue depth and outcomes."""
+    return jsonify(job_queue.stats())
+
+@app.route("/profiles", methods=["GET"])
+def profiles():
+    """Stored request profiles, newest first."""
+    if not profiling.authorized(request.headers):
+        abort(403)
+    return jsonify(profiling.list_profiles())
+
+@app.route("/profiles/<profile_id>", methods=["GET"])
+def profile_download(profile_id):
+    """<id> for the span tree and top functions (JSON), <id>.prof for the raw cProfile dump."""
+    if not profiling.authorized(request.headers):
+        abort(403)
+    profile_id, extension = (profile_id[:-5], ".prof") if profile_id.endswith(".prof") else (profile_id, ".json")
+    path = profiling.profile_path(profile_id, extension)
+    if path is None:
+        abort(404)
+    if extension == ".prof":
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True,
+                         download_name=f"{profile_id}.prof")
+    return send_file(path, mimetype="application/json")
 
 if __name__ == "__main__":
     app.run(debug=True)
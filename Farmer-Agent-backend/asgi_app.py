@@ -0,0 +1,209 @@
+"""
+Async (ASGI) serving mode for the farmer agent.
+
+Exposes the same /farmer-agent contract as app.py, but every upstream call
+goes through the async utils on a shared httpx client, so a single process
+can keep hundreds of farmer requests in flight.
+
+Run with:
+    hypercorn asgi_app:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import os
+import time
+
+from quart import Quart, Response, abort, g, request, jsonify, send_file
+from quart_cors import cors
+
+from utils.settings import settings  # first: loads .env before other utils read their tunables
+from utils.async_http import close_async_client
+from utils.health import health_monitor
+from utils.audio_utils import transcribe_audio_async
+from utils.image_utils import analyze_image_with_gemini_async
+from utils.prompt_utils import assemble_prompt, summarize_inputs
+from utils.ai_handler import get_ai_response_async, is_error
+from utils.weather_utils import get_weather_async
+from utils.image_preprocess import ImageRejected
+from utils.limiter import limiter_stats
+from utils import metrics, profiling
+
+app = cors(Quart(__name__), allow_origin="*")
+
+
+GEMINI_BATCH_CONCURRENCY = int(os.getenv("GEMINI_BATCH_CONCURRENCY", "4"))
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", "64"))
+
+
+async def timed(coro, span="call"):
+    """Await coro and return (result, elapsed milliseconds); span names it in request profiles."""
+    start = time.perf_counter()
+    with profiling.span(span):
+        result = await coro
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+@app.before_serving
+async def startup():
+    health_monitor.start()
+
+
+@app.after_serving
+async def shutdown():
+    health_monitor.stop()
+    await close_async_client()
+
+
+@app.before_request
+async def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request(response):
+    started = getattr(g, "request_started", None)
+    if started is not None:
+        metrics.request_seconds.observe(
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=str(response.status_code),
+        )
+    return response
+
+
+@app.route("/farmer-agent", methods=["POST"])
+async def farmer_agent():
+    try:
+        started = time.perf_counter()
+        form = await request.form
+        files = await request.files
+        text = form.get("text")
+        city = form.get("city")
+        lang = form.get("lang", "en")
+
+        audio = files.get("audio")
+        image = files.get("image")
+
+        # Spans only: the event loop thread is shared, so no cProfile here
+        with profiling.profile_request(request.headers, "/farmer-agent", cpu=False) as session:
+            result = await run_farmer_agent(text, city, lang, audio, image, started)
+            with profiling.span("jsonify"):
+                response = jsonify(result)
+        if session:
+            response.headers["X-Profile-Id"] = session.id
+        return response
+
+    except ImageRejected as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+async def run_farmer_agent(text, city, lang, audio, image, started):
+    """The /farmer-agent pipeline; started is when the request came in."""
+    stages = {"weather": timed(get_weather_async(city or ""), "weather")}
+    if audio:
+        stages["audio"] = timed(transcribe_audio_async(audio), "audio")
+    if image:
+        stages["image"] = timed(analyze_image_with_gemini_async(image), "image")
+
+    results, timings = {}, {}
+    with profiling.span("inputs"):
+        gathered = await asyncio.gather(*stages.values())
+    for stage, (result, elapsed) in zip(stages, gathered):
+        results[stage], timings[stage] = result, elapsed
+
+    audio_text = results.get("audio", "")
+    image_desc = results.get("image", "")
+    weather = results["weather"]
+    timings["inputs"] = round((time.perf_counter() - started) * 1000, 1)
+
+    prompt_start = time.perf_counter()
+    with profiling.span("prompt") as span:
+        prompt, prompt_stats = assemble_prompt(text, audio_text, image_desc, weather, lang)
+        query = summarize_inputs(text, audio_text, image_desc)
+        span.set(prompt_tokens=prompt_stats["prompt_tokens"], trimmed=prompt_stats["trimmed"])
+    timings["prompt"] = round((time.perf_counter() - prompt_start) * 1000, 1)
+    response, timings["llm"] = await timed(
+        get_ai_response_async(prompt, True, lang, query=query, weather=weather), "llm")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+
+    metrics.observe_timings(timings, lang)
+    metrics.prompt_tokens.observe(prompt_stats["prompt_tokens"], lang=metrics.lang_label(lang))
+    if is_error(response):
+        metrics.stage_errors.inc(stage="llm")
+
+    return {
+        "city": city,
+        "weather": weather,
+        "ai_response": response,
+        "input_used": {
+            "text": text,
+            "audio_text": audio_text,
+            "image_description": image_desc
+        },
+        "prompt_stats": prompt_stats,
+        "timings_ms": timings
+    }
+
+
+@app.route("/farmer-agent/diagnose-batch", methods=["POST"])
+async def diagnose_batch():
+    """Same contract as the Flask endpoint: many photos, bounded Gemini fan-out."""
+    files = await request.files
+    images = [image for image in files.getlist("images") if image]
+    if not images:
+        return jsonify({"error": "No images uploaded"}), 400
+    if len(images) > BATCH_MAX_IMAGES:
+        return jsonify({"error": f"Too many images ({len(images)}), limit is {BATCH_MAX_IMAGES}"}), 413
+
+    limit = asyncio.Semaphore(GEMINI_BATCH_CONCURRENCY)
+
+    async def diagnose_one(image):
+        async with limit:
+            try:
+                diagnosis, elapsed = await timed(analyze_image_with_gemini_async(image), "image")
+                return {"filename": image.filename, "diagnosis": diagnosis, "ms": elapsed}
+            except Exception as e:
+                return {"filename": image.filename, "error": str(e)}
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(diagnose_one(image) for image in images))
+    elapsed = time.perf_counter() - started
+
+    return jsonify({
+        "results": results,
+        "images": len(images),
+        "seconds": round(elapsed, 2),
+        "images_per_sec": round(len(images) / elapsed, 2) if elapsed > 0 else None
+    })
+
+@app.route("/metrics", methods=["GET"])
+async def metrics_route():
+    """Prometheus text format: stage latencies, payload sizes, upstream calls and limiter queues."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/limiter-stats", methods=["GET"])
+async def limiter_stats_route():
+    """Per-provider slots in use, queue depth, waits and rejections."""
+    return jsonify(limiter_stats())
+
+@app.route("/profiles", methods=["GET"])
+async def profiles():
+    """Stored request profiles, newest first."""
+    if not profiling.authorized(request.headers):
+        abort(403)
+    return jsonify(profiling.list_profiles())
+
+@app.route("/profiles/<profile_id>", methods=["GET"])
+async def profile_download(profile_id):
+    """Span tree of a profiled request (this app records no CPU profile)."""
+    if not profiling.authorized(request.headers):
+        abort(403)
+    path = profiling.profile_path(profile_id, ".json")
+    if path is None:
+        abort(404)
+    return await send_file(path, mimetype="application/json")
+
+if __name__ == "__main__":
+    app.run()
@@ -0,0 +1,64 @@
+"""
+Benchmark the image preprocessing stage over a folder of sample photos.
+
+    python benchmarks/bench_image_preprocess.py [image_dir] [--max-edge 1024] [--quality 80] [--link-kbps 512]
+
+Reports bytes before/after, preprocessing time, and the estimated upload
+time saved on a slow rural link.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.image_preprocess import preprocess_image, ImageRejected  # noqa: E402
+
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image_dir", nargs="?", default="static")
+    parser.add_argument("--max-edge", type=int, default=1024)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--link-kbps", type=float, default=512, help="uplink speed used for the upload estimate")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.image_dir, name)
+        for name in os.listdir(args.image_dir)
+        if name.lower().endswith(EXTENSIONS)
+    )
+    if not paths:
+        print(f"❌ No images found in {args.image_dir}")
+        return
+
+    bytes_per_sec = args.link_kbps * 1000 / 8
+    total_in = total_out = total_ms = 0
+
+    print(f"{'image':32} {'before':>10} {'after':>10} {'saved':>7} {'prep ms':>8} {'upload s before/after':>22}")
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            _, _, info = preprocess_image(data, max_edge=args.max_edge, quality=args.quality)
+        except ImageRejected as e:
+            print(f"{os.path.basename(path)[:32]:32} ❌ rejected: {e}")
+            continue
+        total_in += info["original_bytes"]
+        total_out += info["processed_bytes"]
+        total_ms += info["ms"]
+        print(f"{os.path.basename(path)[:32]:32} {info['original_bytes']:>10} {info['processed_bytes']:>10} "
+              f"{info['saved_pct']:>6}% {info['ms']:>8} "
+              f"{info['original_bytes'] / bytes_per_sec:>10.2f} / {info['processed_bytes'] / bytes_per_sec:<9.2f}")
+
+    if total_in:
+        print()
+        print(f"📦 Total: {total_in} -> {total_out} bytes ({100 * (1 - total_out / total_in):.1f}% smaller)")
+        print(f"⏱️ Preprocessing: {total_ms:.1f} ms total")
+        print(f"📡 Upload at {args.link_kbps:g} kbps: {total_in / bytes_per_sec:.2f}s -> {total_out / bytes_per_sec:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Load-test /farmer-agent against local fakes of every upstream.
+
+    python benchmarks/bench_load.py [--server flask|asgi] [--concurrency 16] [--requests 400 | --duration 60]
+                                    [--audio-share 0.3] [--image-share 0.3] [--upstream openrouter=800:200:0.02 ...]
+
+Starts the fake OpenRouter / Ollama / OpenWeather / AssemblyAI / Gemini
+servers from fake_upstreams.py, launches the backend in a subprocess with
+its base URLs pointed at them, then keeps --concurrency requests in
+flight and reports throughput, p50/p95/p99 latency, errors, the backend's
+own per-stage timings and how many calls reached each upstream. Nothing
+leaves the machine, so runs are repeatable offline.
+
+Every question, recording and photo is unique unless --repeat is given,
+and the semantic answer cache is switched off, so each request pays for
+the full pipeline; weather is still cached per city, as in production.
+The image diagnosis cache and profiles go to a temporary directory that
+is deleted afterwards, so a rerun with the same --seed starts cold too.
+Limiter and pool tunables (LIMIT_*, STAGE_WORKERS, ...) are passed
+through from the environment. --json saves the full report.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_upstreams import FakeUpstreams, add_profile_arguments  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FLASK_SERVER = """
+import os, app
+app.app.run(host="127.0.0.1", port=int(os.environ["BENCH_PORT"]), threaded=True)
+"""
+
+QUESTIONS = [
+    "My chilli leaves are curling, what should I spray?",
+    "Brown spots on tomato leaves, is it blight?",
+    "When should I irrigate paddy this week?",
+    "Yellow leaves on banana plants after rain",
+    "Which fertilizer for groundnut at flowering stage?",
+]
+CITIES = ["Salem", "Madurai", "Coimbatore", "Thanjavur", "Erode"]
+STAGES = ("weather", "audio", "image", "inputs", "prompt", "llm", "total")
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 1) if values else 0.0,
+        "p50": round(percentile(values, 50), 1),
+        "p95": round(percentile(values, 95), 1),
+        "p99": round(percentile(values, 99), 1),
+        "max": round(values[-1], 1) if values else 0.0,
+    }
+
+
+def make_image(seed):
+    """A small noisy JPEG; noise keeps perceptual hashes apart so the diagnosis cache can't answer it."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.frombytes("RGB", (256, 256), bytes(rng.getrandbits(8) for _ in range(256 * 256 * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def make_request(i, args):
+    rng = random.Random(i if args.repeat else f"{args.seed}-{i}")
+    question = rng.choice(QUESTIONS)
+    if not args.repeat:
+        question = f"{question} (field {args.seed}-{i})"
+    data = {"text": question, "city": rng.choice(CITIES), "lang": args.lang}
+    files = {}
+    if rng.random() < args.audio_share:
+        payload = b"fake-audio" if args.repeat else f"fake-audio-{args.seed}-{i}".encode() + os.urandom(2048)
+        files["audio"] = ("question.wav", payload, "audio/wav")
+    if rng.random() < args.image_share:
+        files["image"] = ("crop.jpg", make_image(0 if args.repeat else f"{args.seed}-{i}"), "image/jpeg")
+    kind = "+".join(["text"] + sorted(files))
+    return data, files, kind
+
+
+def send(session, url, i, args):
+    data, files, kind = make_request(i, args)
+    start = time.perf_counter()
+    try:
+        response = session.post(url, data=data, files=files or None, timeout=args.timeout)
+        elapsed = (time.perf_counter() - start) * 1000
+        body = response.json() if response.headers.get("Content-Type", "").startswith("application/json") else {}
+    except Exception as e:
+        return {"kind": kind, "ms": (time.perf_counter() - start) * 1000, "status": None, "error": str(e)}
+
+    result = {"kind": kind, "ms": elapsed, "status": response.status_code, "error": None,
+              "timings": body.get("timings_ms", {})}
+    if response.status_code != 200:
+        result["error"] = f"HTTP {response.status_code}"
+    elif str(body.get("ai_response", "")).startswith("❌"):
+        result["error"] = body["ai_response"][:80]
+    return result
+
+
+def drive(url, args):
+    """Keep args.concurrency requests in flight until the request count or duration is reached."""
+    counter = itertools.count()
+    results, lock = [], threading.Lock()
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    def worker():
+        session = requests.Session()
+        while True:
+            i = next(counter)
+            if deadline is None and i >= args.requests:
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            result = send(session, url, i, args)
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=worker, name=f"load-{n}", daemon=True) for n in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def start_backend(args, env, log):
+    env = {**env, "BENCH_PORT": str(args.port)}
+    if args.server == "flask":
+        command = [sys.executable, "-c", FLASK_SERVER]
+    else:
+        command = [sys.executable, "-m", "hypercorn", "asgi_app:app", "--bind", f"127.0.0.1:{args.port}"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            if requests.get(f"{base_url}/metrics", timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def report(results, wall_seconds, args, upstream_stats):
+    ok = [r for r in results if r["error"] is None]
+    errors = {}
+    for r in results:
+        if r["error"] is not None:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+
+    stage_ms = {}
+    for r in ok:
+        for stage, ms in r["timings"].items():
+            stage_ms.setdefault(stage, []).append(ms)
+
+    by_kind = {}
+    for r in ok:
+        by_kind.setdefault(r["kind"], []).append(r["ms"])
+
+    return {
+        "server": args.server,
+        "concurrency": args.concurrency,
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else 0.0,
+        "latency_ms": summarize([r["ms"] for r in ok]),
+        "latency_ms_by_kind": {kind: summarize(values) for kind, values in sorted(by_kind.items())},
+        "stage_ms": {stage: summarize(stage_ms[stage]) for stage in STAGES if stage in stage_ms},
+        "upstreams": upstream_stats,
+    }
+
+
+def print_report(summary):
+    latency = summary["latency_ms"]
+    print(f"\n📊 {summary['server']} · {summary['concurrency']} concurrent · "
+          f"{summary['requests']} requests in {summary['wall_seconds']}s")
+    print(f"   throughput  {summary['throughput_rps']} req/s ({summary['ok']} ok)")
+    print(f"   latency ms  p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    for error, count in sorted(summary["errors"].items(), key=lambda item: -item[1]):
+        print(f"   ❌ {count:5d} × {error}")
+
+    print(f"\n{'request kind':22} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for kind, stats in summary["latency_ms_by_kind"].items():
+        print(f"{kind:22} {stats['count']:6d} {stats['p50']:8.1f} {stats['p95']:8.1f} {stats['p99']:8.1f}")
+
+    print(f"\n{'stage (server side)':22} {'count':>6} {'mean':>8} {'p95':>8} {'p99':>8}")
+    for stage, stats in summary["stage_ms"].items():
+        print(f"{stage:22} {stats['count']:6d} {stats['mean']:8.1f} {stats['p95']:8.1f} {stats['p99']:8.1f}")
+
+    print(f"\n{'upstream':22} {'calls':>6} {'errors':>8}")
+    for name, stats in summary["upstreams"].items():
+        print(f"{name:22} {stats['requests']:6d} {stats['errors']:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", choices=("flask", "asgi"), default="flask")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=0, help="run for this many seconds instead of --requests")
+    parser.add_argument("--warmup", type=int, default=3, help="unrecorded requests sent first, one at a time")
+    parser.add_argument("--audio-share", type=float, default=0.0, help="fraction of requests with a voice recording")
+    parser.add_argument("--image-share", type=float, default=0.0, help="fraction of requests with a crop photo")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--repeat", action="store_true", help="reuse identical inputs (measures the caches instead)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--server-log", metavar="PATH", help="keep the backend's output here")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    fakes = FakeUpstreams(dict(args.upstream), args.error_status).start()
+    for name, server in fakes.servers.items():
+        print(f"🧪 fake {name:12} {server.url}  ({server.profile})")
+
+    scratch = tempfile.mkdtemp(prefix="bench-load-")
+    env = {
+        **os.environ,
+        **fakes.env(),
+        "PYTHONUNBUFFERED": "1",
+        "IMAGE_CACHE_DB": os.path.join(scratch, "image_diagnoses.db"),
+        "PROFILE_DIR": os.path.join(scratch, "profiles"),
+    }
+    if not args.repeat:
+        env.setdefault("SEMANTIC_CACHE_THRESHOLD", "2")  # cosine never exceeds 1: no cache hits
+
+    log = open(args.server_log, "w") if args.server_log else tempfile.TemporaryFile(mode="w+")
+    process = start_backend(args, env, log)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        if not wait_ready(base_url, process):
+            print(f"❌ {args.server} backend did not come up on {base_url}")
+            if not args.server_log:
+                log.seek(0)
+                print(log.read()[-3000:])
+            return 1
+        print(f"🚀 {args.server} backend ready on {base_url}")
+
+        url = f"{base_url}/farmer-agent"
+        session = requests.Session()
+        for i in range(args.warmup):
+            send(session, url, -1 - i, args)
+
+        before = fakes.stats()
+        results, wall_seconds = drive(url, args)
+        after = fakes.stats()
+        upstream_stats = {
+            name: {field: after[name][field] - before[name][field] for field in after[name]} for name in after
+        }
+
+        summary = report(results, wall_seconds, args, upstream_stats)
+        print_report(summary)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(summary, f, indent=2)
+            print(f"\n💾 Report written to {args.json}")
+        return 0
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+        fakes.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
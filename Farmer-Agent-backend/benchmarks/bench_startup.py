@@ -0,0 +1,91 @@
+"""
+Measure how fast a fresh backend worker becomes useful.
+
+    python benchmarks/bench_startup.py [--runs 5] [--importtime]
+
+Each run starts a new interpreter and times `import app` (Flask) and
+`import asgi_app` (Quart), plus the first GET /health on the Flask app,
+which is what a restarted or autoscaled worker pays before serving
+traffic. --importtime also lists the slowest imports from
+`python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FLASK_PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get("/health")
+first = time.perf_counter()
+print("\\n" + json.dumps({"import_ms": (imported - start) * 1000, "first_request_ms": (first - start) * 1000,
+                  "status": response.status_code}))
+"""
+
+ASGI_PROBE = """
+import json, time
+start = time.perf_counter()
+import asgi_app
+print("\\n" + json.dumps({"import_ms": (time.perf_counter() - start) * 1000}))
+"""
+
+
+def run_probe(code):
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    # the app's background threads print too; take the probe's JSON and ignore anything glued after it
+    line = [line for line in result.stdout.splitlines() if line.startswith("{")][-1]
+    return json.JSONDecoder().raw_decode(line)[0]
+
+
+def slowest_imports(module, top=15):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def summarize(label, values):
+    print(f"{label:28} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   "
+          f"max {max(values):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports of app")
+    args = parser.parse_args()
+
+    run_probe(FLASK_PROBE)  # warm the bytecode cache so every run measures the same thing
+
+    flask_runs = [run_probe(FLASK_PROBE) for _ in range(args.runs)]
+    asgi_runs = [run_probe(ASGI_PROBE) for _ in range(args.runs)]
+
+    print(f"{args.runs} fresh interpreters each")
+    summarize("import app", [run["import_ms"] for run in flask_runs])
+    summarize("first GET /health (app)", [run["first_request_ms"] for run in flask_runs])
+    summarize("import asgi_app", [run["import_ms"] for run in asgi_runs])
+
+    if args.importtime:
+        print("\nslowest imports of app (cumulative):")
+        for micros, name in slowest_imports("app"):
+            print(f"{micros / 1000:10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+"""
+Local stand-ins for every upstream the backend calls, for offline load tests.
+
+    python benchmarks/fake_upstreams.py [--upstream openrouter=800:200:0.02 ...] [--error-status 500]
+
+Starts one HTTP server per provider on 127.0.0.1 and prints the env vars
+that point the backend at them:
+
+    openrouter   POST /api/v1/chat/completions (JSON or SSE), GET /api/v1/models
+    ollama       POST /api/generate (JSON or NDJSON stream), GET /api/tags
+    openweather  GET  /data/2.5/weather
+    assemblyai   POST /v2/upload, POST /v2/transcript, GET /v2/transcript/<id>
+    gemini       POST /v1beta/models/<model>:generateContent
+    internet     GET  /  (the health monitor's uplink probe)
+
+Each provider answers after LATENCY_MS +/- JITTER_MS (uniform) and fails
+ERROR_RATE of its requests with --error-status. For AssemblyAI the latency
+is the transcription time: polls say "processing" until it has passed.
+bench_load.py starts these itself; run this file on its own to poke the
+backend by hand.
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_PROFILES = {
+    # provider: (latency ms, jitter ms, error rate)
+    "openrouter": (800, 200, 0.0),
+    "ollama": (1500, 300, 0.0),
+    "openweather": (80, 20, 0.0),
+    "assemblyai": (1500, 300, 0.0),
+    "gemini": (1200, 300, 0.0),
+    "internet": (20, 5, 0.0),
+}
+
+ANSWER = (
+    "Leaf curl in chilli is usually spread by whiteflies and thrips. Remove and burn the badly "
+    "curled plants. Spray neem oil (5 ml per litre of water) in the evening every 7 days. "
+    "Put yellow sticky traps in the field and avoid too much nitrogen fertilizer."
+)
+DIAGNOSIS = "This looks like early blight: brown spots with rings on the older leaves."
+TRANSCRIPT = "my chilli plant leaves are curling and turning yellow what should I do"
+STREAM_PIECES = 12
+
+
+class Profile:
+    def __init__(self, latency_ms, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def delay(self):
+        """Seconds to wait before answering."""
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+    def __repr__(self):
+        return f"{self.latency_ms}±{self.jitter_ms}ms, {self.error_rate:.0%} errors"
+
+
+def parse_profile(spec):
+    """'openrouter=800:200:0.02' -> ('openrouter', Profile(800, 200, 0.02)); jitter and error rate are optional."""
+    name, _, values = spec.partition("=")
+    if name not in DEFAULT_PROFILES:
+        raise argparse.ArgumentTypeError(f"unknown upstream {name!r}, expected one of {', '.join(DEFAULT_PROFILES)}")
+    defaults = DEFAULT_PROFILES[name]
+    parts = [float(value) for value in values.split(":") if value] if values else []
+    latency, jitter, error_rate = (parts + list(defaults)[len(parts):])[:3]
+    return name, Profile(latency, jitter, error_rate)
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+    provider = None  # set on each server's subclass
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def profile(self):
+        return self.server.profile
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def read_json(self):
+        try:
+            return json.loads(self.read_body() or b"{}")
+        except ValueError:
+            return {}
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, content_type, chunks, total_delay):
+        # First piece after a third of the latency, the rest spread evenly:
+        # roughly how a model's time-to-first-token compares to the full answer.
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(total_delay / 3)
+        step = (total_delay * 2 / 3) / max(len(chunks) - 1, 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(step)
+            self.wfile.write(chunk.encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+    def send_error_reply(self):
+        status = self.server.error_status
+        self.server.count("errors")
+        body = json.dumps({"error": {"message": f"fake {self.provider} error", "code": status}}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        self.server.count("requests")
+        path = urlparse(self.path).path
+        route, params = self.server.match(method, path)
+        if route is None:
+            self.read_body()
+            self.send_json({"error": f"no fake for {method} {path}"}, status=404)
+            return
+        if path not in PROBE_PATHS and self.profile.fails():
+            self.read_body()
+            time.sleep(self.profile.delay())
+            self.send_error_reply()
+            return
+        route(self, **params)
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+
+# OpenRouter
+
+def openrouter_models(handler):
+    handler.send_json({"data": [{"id": "deepseek/deepseek-chat"}]})
+
+
+def openrouter_chat(handler):
+    payload = handler.read_json()
+    delay = handler.profile.delay()
+    if payload.get("stream"):
+        pieces = split_answer(ANSWER)
+        events = [": OPENROUTER PROCESSING\n\n"]
+        events += [
+            "data: " + json.dumps({"choices": [{"delta": {"content": piece}}]}) + "\n\n" for piece in pieces
+        ]
+        events.append("data: [DONE]\n\n")
+        handler.send_stream("text/event-stream", events, delay)
+        return
+    time.sleep(delay)
+    handler.send_json({
+        "id": f"gen-{next(handler.server.ids)}",
+        "model": payload.get("model"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+    })
+
+
+# Ollama
+
+def ollama_tags(handler):
+    handler.send_json({"models": [{"name": "gemma:3b"}]})
+
+
+def ollama_generate(handler):
+    payload = handler.read_json()
+    delay = handler.profile.delay()
+    if payload.get("stream", True):  # Ollama streams unless told not to
+        lines = [json.dumps({"response": piece, "done": False}) + "\n" for piece in split_answer(ANSWER)]
+        lines.append(json.dumps({"response": "", "done": True}) + "\n")
+        handler.send_stream("application/x-ndjson", lines, delay)
+        return
+    time.sleep(delay)
+    handler.send_json({"model": payload.get("model"), "response": ANSWER, "done": True})
+
+
+# OpenWeather
+
+def openweather_current(handler):
+    city = parse_qs(urlparse(handler.path).query).get("q", ["Salem"])[0]
+    time.sleep(handler.profile.delay())
+    handler.send_json({
+        "name": city,
+        "main": {"temp": 31.5, "humidity": 62},
+        "weather": [{"main": "Clouds", "description": "scattered clouds"}],
+    })
+
+
+# AssemblyAI
+
+def assemblyai_upload(handler):
+    handler.read_body()
+    handler.send_json({"upload_url": f"https://cdn.fake/upload/{next(handler.server.ids)}"})
+
+
+def assemblyai_submit(handler):
+    payload = handler.read_json()
+    transcript = {
+        "id": f"tr-{next(handler.server.ids)}",
+        "audio_url": payload.get("audio_url"),
+        "language_code": payload.get("language_code"),
+        "ready_at": time.monotonic() + handler.profile.delay(),
+    }
+    with handler.server.lock:
+        handler.server.transcripts[transcript["id"]] = transcript
+    handler.send_json(assemblyai_view(transcript))
+
+
+def assemblyai_poll(handler, transcript_id):
+    with handler.server.lock:
+        transcript = handler.server.transcripts.get(transcript_id)
+    if transcript is None:
+        handler.send_json({"error": "transcript not found"}, status=404)
+        return
+    view = assemblyai_view(transcript)
+    if view["status"] == "completed":
+        with handler.server.lock:
+            handler.server.transcripts.pop(transcript_id, None)
+    handler.send_json(view)
+
+
+def assemblyai_view(transcript):
+    done = time.monotonic() >= transcript["ready_at"]
+    return {
+        "id": transcript["id"],
+        "audio_url": transcript["audio_url"],
+        "language_code": transcript["language_code"],
+        "status": "completed" if done else "processing",
+        "text": TRANSCRIPT if done else None,
+    }
+
+
+# Gemini
+
+def gemini_generate(handler, model):
+    handler.read_body()
+    time.sleep(handler.profile.delay())
+    handler.send_json({
+        "candidates": [{
+            "content": {"role": "model", "parts": [{"text": DIAGNOSIS}]},
+            "finishReason": "STOP",
+            "index": 0,
+        }],
+        "modelVersion": model,
+    })
+
+
+# Uplink probe
+
+def internet_probe(handler):
+    time.sleep(handler.profile.delay())
+    handler.send_json({"ok": True})
+
+
+def split_answer(text, pieces=STREAM_PIECES):
+    words = text.split(" ")
+    size = max(1, -(-len(words) // pieces))
+    return [" ".join(words[i:i + size]) + (" " if i + size < len(words) else "") for i in range(0, len(words), size)]
+
+
+ROUTES = {
+    "openrouter": {("GET", "/api/v1/models"): openrouter_models, ("POST", "/api/v1/chat/completions"): openrouter_chat},
+    "ollama": {("GET", "/api/tags"): ollama_tags, ("POST", "/api/generate"): ollama_generate},
+    "openweather": {("GET", "/data/2.5/weather"): openweather_current},
+    "assemblyai": {("POST", "/v2/upload"): assemblyai_upload, ("POST", "/v2/transcript"): assemblyai_submit},
+    "gemini": {},
+    "internet": {("GET", "/"): internet_probe},
+}
+PATTERNS = {
+    "assemblyai": [(("GET", re.compile(r"/v2/transcript/(?P<transcript_id>[\w-]+)")), assemblyai_poll)],
+    "gemini": [(("POST", re.compile(r"/v1beta/models/(?P<model>[\w.-]+):generateContent")), gemini_generate)],
+}
+# Health probes and AssemblyAI bookkeeping answer at once and never fail,
+# so the profile only shapes the calls a farmer's request actually waits on.
+PROBE_PATHS = {"/api/v1/models", "/api/tags", "/v2/upload"}
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, provider, profile, error_status=500, host="127.0.0.1", port=0):
+        handler = type(f"{provider.title()}Handler", (FakeHandler,), {"provider": provider})
+        super().__init__((host, port), handler)
+        self.provider = provider
+        self.profile = profile
+        self.error_status = error_status
+        self.routes = ROUTES[provider]
+        self.patterns = PATTERNS.get(provider, [])
+        self.transcripts = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0}
+
+    def match(self, method, path):
+        """(handler, path params) for a request, or (None, {})."""
+        route = self.routes.get((method, path))
+        if route is not None:
+            return route, {}
+        for (route_method, pattern), route in self.patterns:
+            found = pattern.fullmatch(path) if route_method == method else None
+            if found:
+                return route, found.groupdict()
+        return None, {}
+
+    def count(self, field):
+        with self.lock:
+            self.stats[field] += 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeUpstreams:
+    """All fake providers, each on its own port, served from background threads."""
+
+    def __init__(self, profiles=None, error_status=500, host="127.0.0.1"):
+        profiles = profiles or {}
+        self.servers = {
+            name: FakeServer(name, profiles.get(name) or Profile(*defaults), error_status, host)
+            for name, defaults in DEFAULT_PROFILES.items()
+        }
+        self._threads = []
+
+    def start(self):
+        for name, server in self.servers.items():
+            thread = threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def env(self):
+        """Env vars that point the backend at the fakes (with dummy keys)."""
+        urls = {name: server.url for name, server in self.servers.items()}
+        return {
+            "OPENROUTER_BASE_URL": f"{urls['openrouter']}/api/v1",
+            "OLLAMA_BASE_URL": urls["ollama"],
+            "OPENWEATHER_BASE_URL": f"{urls['openweather']}/data/2.5",
+            "ASSEMBLYAI_BASE_URL": urls["assemblyai"],
+            "GEMINI_BASE_URL": f"{urls['gemini']}/v1beta",
+            "INTERNET_PROBE_URL": f"{urls['internet']}/",
+            "OPENROUTER_API_KEY": "fake-openrouter-key",
+            "GOOGLE_API_KEY": "fake-google-key",
+            "ASSEMBLYAI_KEY": "fake-assemblyai-key",
+            "OPENWEATHER_KEY": "fake-openweather-key",
+        }
+
+    def stats(self):
+        stats = {}
+        for name, server in self.servers.items():
+            with server.lock:
+                stats[name] = dict(server.stats)
+        return stats
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--upstream", action="append", type=parse_profile, default=[], metavar="NAME=MS[:JITTER[:ERRORS]]",
+                        help="latency/jitter (ms) and error rate for one fake upstream; repeatable")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of injected errors (e.g. 429, 503)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    fakes = FakeUpstreams(dict(args.upstream), args.error_status).start()
+    for name, server in fakes.servers.items():
+        print(f"🧪 {name:12} {server.url}  ({server.profile})")
+    print()
+    for key, value in fakes.env().items():
+        print(f"export {key}={value}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fakes.stop()
+
+
+if __name__ == "__main__":
+    main()
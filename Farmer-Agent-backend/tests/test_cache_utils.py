@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+
+from utils import cache_utils
+from utils.cache_utils import SQLiteStore, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def counting_loader(values):
+    calls = []
+
+    def load():
+        calls.append(1)
+        return values[len(calls) - 1]
+
+    return load, calls
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_fresh_entry_is_served_without_loading(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    cache = TTLCache(ttl=60)
+    load, calls = counting_loader(["first", "second"])
+
+    assert cache.get_or_load("salem", load) == "first"
+    clock.now += 59
+    assert cache.get_or_load("salem", load) == "first"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_expired_entry_is_reloaded(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    cache = TTLCache(ttl=60, stale_ttl=30)
+    load, calls = counting_loader(["first", "second"])
+
+    cache.get_or_load("salem", load)
+    clock.now += 91
+    assert cache.get_or_load("salem", load) == "second"
+    assert len(calls) == 2
+    assert cache.stats()["misses"] == 2
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    cache = TTLCache(ttl=60, stale_ttl=30)
+    cache.set("salem", "old")
+    clock.now += 61
+
+    release = threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        release.wait(2)
+        return "new"
+
+    assert cache.get_or_load("salem", slow_load) == "old"
+    assert cache.get_or_load("salem", slow_load) == "old"  # refresh already running
+    release.set()
+    wait_for(lambda: cache._lookup("salem")[0] == "new")
+    assert len(calls) == 1
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_failed_refresh_keeps_the_stale_value(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    cache = TTLCache(ttl=60, stale_ttl=30)
+    cache.set("salem", "old")
+    clock.now += 61
+
+    def broken():
+        raise RuntimeError("upstream down")
+
+    assert cache.get_or_load("salem", broken) == "old"
+    wait_for(lambda: not cache._refreshing)
+    assert cache._lookup("salem")[0] == "old"
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def slow_load():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        return "weather"
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("salem", slow_load)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    started.wait(2)
+    wait_for(lambda: cache.stats()["misses"] == 5)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ["weather"] * 5
+
+
+def test_concurrent_misses_share_the_owners_error():
+    cache = TTLCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls, errors = [], []
+
+    def failing_load():
+        calls.append(1)
+        started.set()
+        release.wait(2)
+        raise RuntimeError("upstream down")
+
+    def get():
+        try:
+            cache.get_or_load("salem", failing_load)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    started.wait(2)
+    wait_for(lambda: cache.stats()["misses"] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert errors == ["upstream down"] * 3
+    assert cache._lookup("salem") is None  # failures are never cached
+
+
+def test_async_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "weather"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_load_async("salem", load) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["weather"] * 5
+    assert len(calls) == 1
+
+
+def test_async_stale_refresh_finishes(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    cache = TTLCache(ttl=60, stale_ttl=30)
+    cache.set("salem", "old")
+    clock.now += 61
+
+    async def load():
+        return "new"
+
+    async def main():
+        assert await cache.get_or_load_async("salem", load) == "old"
+        assert len(cache._refresh_tasks) == 1
+        while cache._refresh_tasks:
+            await asyncio.sleep(0.005)
+
+    asyncio.run(main())
+    assert cache._lookup("salem")[0] == "new"
+
+
+def test_lru_eviction():
+    cache = TTLCache(ttl=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache._lookup("a")
+    cache.set("c", 3)
+    assert cache._lookup("b") is None
+    assert cache._lookup("a")[0] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_store_is_shared_and_pruned(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_utils.time, "time", clock)
+    store = SQLiteStore(str(tmp_path / "cache.db"), table="weather")
+    writer = TTLCache(ttl=60, stale_ttl=30, store=store, prune_interval=0)
+    writer.set("salem", {"temp": 31})
+
+    reader = TTLCache(ttl=60, stale_ttl=30, store=store)
+    assert reader.get_or_load("salem", lambda: {"temp": 0}) == {"temp": 31}
+
+    clock.now += 91
+    writer.set("madurai", {"temp": 33})  # prunes rows too old to be served
+    assert store.get("salem") is None
+    assert store.get("madurai")[0] == {"temp": 33}
@@ -0,0 +1,30 @@
+import argparse
+
+import pytest
+
+from fake_upstreams import DEFAULT_PROFILES, parse_profile
+
+
+def test_full_profile():
+    name, profile = parse_profile("openrouter=800:200:0.02")
+    assert name == "openrouter"
+    assert (profile.latency_ms, profile.jitter_ms, profile.error_rate) == (800, 200, 0.02)
+
+
+def test_missing_fields_take_the_defaults():
+    name, profile = parse_profile("gemini=50")
+    _, default_jitter, default_error_rate = DEFAULT_PROFILES["gemini"]
+    assert (profile.latency_ms, profile.jitter_ms, profile.error_rate) == (50, default_jitter, default_error_rate)
+
+    _, profile = parse_profile("ollama")
+    assert (profile.latency_ms, profile.jitter_ms, profile.error_rate) == DEFAULT_PROFILES["ollama"]
+
+
+def test_unknown_upstream_is_rejected():
+    with pytest.raises(argparse.ArgumentTypeError, match="unknown upstream"):
+        parse_profile("openai=100")
+
+
+def test_delay_stays_non_negative():
+    _, profile = parse_profile("internet=1:50:0")
+    assert all(profile.delay() >= 0 for _ in range(100))
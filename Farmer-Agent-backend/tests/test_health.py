@@ -0,0 +1,140 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import health
+from utils.health import CircuitBreaker, HealthMonitor
+
+
+def test_failures_in_a_row_open_the_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=3, open_seconds=60)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record(False)
+    assert breaker.snapshot() == {"state": "closed", "failures": 2}
+
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.snapshot() == {"state": "closed", "failures": 1}
+
+
+def test_slow_success_counts_as_failure():
+    breaker = CircuitBreaker("test", failure_threshold=1, slow_seconds=1)
+    breaker.record(True, elapsed=5)
+    assert breaker.state == "open"
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=0.05)
+    breaker.record(False)
+    assert not breaker.allow_request()
+
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    assert breaker.state == "half_open"
+    assert not breaker.allow_request()  # the trial is still running
+
+    breaker.record(True)
+    assert breaker.snapshot() == {"state": "closed", "failures": 0}
+    assert breaker.allow_request()
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=3, open_seconds=0.05)
+    breaker.trip()
+    time.sleep(0.06)
+    assert breaker.allow_request()
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_release_frees_the_trial_without_a_verdict():
+    breaker = CircuitBreaker("test", open_seconds=60)
+    breaker.trip()
+    breaker.probe_ok()
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    """Start a local server that answers every GET with the given status; returns its URL."""
+    servers = []
+
+    def start(status):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+        server.status = status
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def probed(monkeypatch, serve):
+    """probe_once with OpenRouter answering the given status, everything else 200, and a fresh breaker."""
+    def probe(openrouter_status):
+        monkeypatch.setattr(health, "PROBES", {
+            "internet": (serve(200), health.has_internet),
+            "openrouter": (serve(openrouter_status), health.provider_up),
+            "ollama": (serve(200), health.provider_up),
+        })
+        breaker = CircuitBreaker("openrouter", open_seconds=60)
+        monkeypatch.setattr(health, "openrouter_breaker", breaker)
+        monitor = HealthMonitor()
+        monitor.probe_once()
+        return monitor, breaker
+
+    return probe
+
+
+def test_healthy_probe_half_opens_the_circuit(probed):
+    monitor, breaker = probed(200)
+    assert all(status["up"] for status in monitor.snapshot()["providers"].values())
+    assert breaker.state == "closed"
+
+    breaker.trip()
+    monitor.probe_once()
+    assert breaker.state == "half_open"
+
+
+@pytest.mark.parametrize("status", [401, 429, 503])
+def test_error_reply_counts_as_down(probed, status):
+    monitor, breaker = probed(status)
+    providers = monitor.snapshot()["providers"]
+    assert providers["openrouter"]["up"] is False
+    assert providers["internet"]["up"] and providers["ollama"]["up"]
+    assert breaker.state == "open"
+
+
+def test_any_reply_proves_the_uplink(serve):
+    url = serve(503)
+    assert health.has_internet(url, timeout=1)
+    assert not health.provider_up(url, timeout=1)
@@ -0,0 +1,90 @@
+import threading
+import time
+
+import pytest
+
+from utils.jobs import JobQueue, QueueFull
+
+
+def wait_until_finished(queue, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        assert time.monotonic() < deadline, "job did not finish"
+        time.sleep(0.01)
+
+
+def test_repeated_key_returns_the_same_job():
+    queue = JobQueue(workers=1)
+    calls = []
+
+    def work(progress):
+        calls.append(1)
+        progress("llm")
+        return {"ai_response": "ok"}
+
+    first, created = queue.submit(work, idempotency_key="abc")
+    again, created_again = queue.submit(work, idempotency_key="abc")
+    assert created and not created_again
+    assert again["job_id"] == first["job_id"]
+
+    job = wait_until_finished(queue, first["job_id"])
+    assert job["result"] == {"ai_response": "ok"}
+    assert [stage["stage"] for stage in job["stages"]] == ["llm"]
+    assert queue.submit(work, idempotency_key="abc")[0]["job_id"] == first["job_id"]
+    assert len(calls) == 1
+    assert queue.stats()["deduplicated"] == 2
+
+
+def test_failed_job_frees_its_key():
+    queue = JobQueue(workers=1)
+
+    def broken(progress):
+        raise RuntimeError("upstream down")
+
+    first, _ = queue.submit(broken, idempotency_key="abc")
+    job = wait_until_finished(queue, first["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"] == "upstream down"
+
+    retry, created = queue.submit(lambda progress: "ok", idempotency_key="abc")
+    assert created
+    assert retry["job_id"] != first["job_id"]
+
+
+def test_jobs_without_a_key_are_never_merged():
+    queue = JobQueue(workers=1)
+    first, _ = queue.submit(lambda progress: 1)
+    second, created = queue.submit(lambda progress: 2)
+    assert created
+    assert first["job_id"] != second["job_id"]
+
+
+def test_full_queue_refuses_new_jobs():
+    queue = JobQueue(workers=1, queue_size=1)
+    release = threading.Event()
+    running, _ = queue.submit(lambda progress: release.wait(2))
+    deadline = time.monotonic() + 2
+    while queue.get(running["job_id"])["status"] != "running":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    waiting, _ = queue.submit(lambda progress: "next")
+    assert waiting["queue_position"] == 1
+    with pytest.raises(QueueFull):
+        queue.submit(lambda progress: "too many")
+    release.set()
+    assert wait_until_finished(queue, waiting["job_id"])["result"] == "next"
+    assert queue.stats()["rejected"] == 1
+
+
+def test_finished_jobs_expire():
+    queue = JobQueue(workers=1, result_ttl=0)
+    job, _ = queue.submit(lambda progress: "ok", idempotency_key="abc")
+    deadline = time.monotonic() + 2
+    while queue.get(job["job_id"]) is not None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert queue.submit(lambda progress: "ok", idempotency_key="abc")[1]
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.limiter import LimiterRejected, ProviderLimiter
+
+
+def test_waiting_caller_gets_the_released_slot():
+    limiter = ProviderLimiter("test", concurrency=1, max_queue=4, max_wait=2)
+    limiter.acquire()
+    admitted = threading.Event()
+
+    def waiter():
+        limiter.acquire()
+        admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    assert limiter.stats()["waiting"] == 1
+    assert not admitted.is_set()
+
+    limiter.release()
+    assert admitted.wait(1)
+    thread.join()
+    stats = limiter.stats()
+    assert stats["in_flight"] == 1
+    assert stats["admitted"] == 2
+
+
+def test_full_queue_rejects_immediately():
+    limiter = ProviderLimiter("test", concurrency=1, max_queue=1, max_wait=1)
+    limiter.acquire()
+    waiter = threading.Thread(target=lambda: pytest.raises(LimiterRejected, limiter.acquire))
+    waiter.start()
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    with pytest.raises(LimiterRejected, match="already waiting"):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.5
+    waiter.join()
+    assert limiter.stats()["rejected_queue_full"] == 1
+
+
+def test_caller_gives_up_at_the_deadline():
+    limiter = ProviderLimiter("test", concurrency=1, max_queue=4, max_wait=0.2)
+    limiter.acquire()
+    started = time.monotonic()
+    with pytest.raises(LimiterRejected, match="no slot within"):
+        limiter.acquire()
+    assert 0.15 < time.monotonic() - started < 1.0
+    stats = limiter.stats()
+    assert stats["rejected_timeout"] == 1
+    assert stats["waiting"] == 0
+
+
+def test_rate_limit_spaces_out_calls():
+    limiter = ProviderLimiter("test", concurrency=10, rps=20, burst=1, max_wait=2)
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    # one token up front, then one every 50 ms
+    assert time.monotonic() - started >= 0.09
+
+
+def test_throttle_pauses_admission():
+    limiter = ProviderLimiter("test", concurrency=1, max_wait=0.1)
+    limiter.throttle(5)
+    with pytest.raises(LimiterRejected):
+        limiter.acquire()
+    assert limiter.stats()["throttled_429"] == 1
+
+
+def test_slot_releases_on_error():
+    limiter = ProviderLimiter("test", concurrency=1, max_wait=0.1)
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("boom")
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_async_queue_and_deadline():
+    limiter = ProviderLimiter("test", concurrency=1, max_queue=1, max_wait=0.2)
+
+    async def main():
+        await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0.05)
+        with pytest.raises(LimiterRejected, match="already waiting"):
+            await limiter.acquire_async()
+        with pytest.raises(LimiterRejected, match="no slot within"):
+            await waiter
+
+        limiter.release()
+        async with limiter.slot_async():
+            assert limiter.stats()["in_flight"] == 1
+
+    asyncio.run(main())
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0
+    assert stats["rejected_queue_full"] == 1
+    assert stats["rejected_timeout"] == 1
@@ -0,0 +1,41 @@
+from utils import metrics
+from utils.metrics import Counter, Histogram
+
+
+def test_counter_renders_labelled_series():
+    counter = Counter("farmer_test_total", "Test counter.", ("stage",))
+    counter.inc(stage="llm")
+    counter.inc(2, stage="llm")
+    counter.inc(stage='we"ird\n')
+    assert counter.render() == [
+        "# HELP farmer_test_total Test counter.",
+        "# TYPE farmer_test_total counter",
+        'farmer_test_total{stage="llm"} 3',
+        'farmer_test_total{stage="we\\"ird\\n"} 1',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("farmer_test_seconds", "Test histogram.", ("stage",), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, stage="llm")
+    assert histogram.render()[2:] == [
+        'farmer_test_seconds_bucket{stage="llm",le="0.1"} 2',
+        'farmer_test_seconds_bucket{stage="llm",le="1"} 3',
+        'farmer_test_seconds_bucket{stage="llm",le="+Inf"} 4',
+        'farmer_test_seconds_sum{stage="llm"} 3.65',
+        'farmer_test_seconds_count{stage="llm"} 4',
+    ]
+
+
+def test_render_includes_registered_metrics_and_collectors():
+    metrics.observe_timings({"llm": 1200}, "kn")
+    metrics.register_collector(lambda: [
+        ("farmer_test_gauge", "gauge", "Test gauge.", [({"provider": "gemini"}, 2.5)]),
+    ])
+    text = metrics.render()
+    assert text.endswith("\n")
+    assert "# TYPE farmer_stage_seconds histogram" in text
+    assert 'farmer_stage_seconds_count{stage="llm",lang="other"}' in text
+    assert "# TYPE farmer_test_gauge gauge" in text
+    assert 'farmer_test_gauge{provider="gemini"} 2.5' in text
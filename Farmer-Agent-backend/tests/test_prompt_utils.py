@@ -0,0 +1,45 @@
+from utils.prompt_utils import assemble_prompt, estimate_tokens, trim_to_tokens
+
+WEATHER = {"temp": 31.5, "humidity": 62, "condition": "scattered clouds"}
+SENTENCE = "The lower leaves of my tomato plants have brown spots with yellow rings around them. "
+
+
+def test_small_inputs_are_kept_whole():
+    prompt, stats = assemble_prompt("Leaf curl in chilli", weather=WEATHER, lang="en", budget=1500)
+    assert "Leaf curl in chilli" in prompt
+    assert stats["trimmed"] == []
+    assert stats["prompt_tokens"] <= 1500
+
+
+def test_long_inputs_are_trimmed_to_the_budget():
+    transcript = SENTENCE * 80
+    diagnosis = SENTENCE * 80
+    prompt, stats = assemble_prompt("Help", transcript, diagnosis, WEATHER, lang="en", budget=600)
+    assert stats["input_tokens"] > 600
+    assert stats["prompt_tokens"] <= 600
+    assert sorted(stats["trimmed"]) == ["audio", "image"]
+    assert "Help" in prompt  # the small typed question is never cut
+
+
+def test_budget_holds_for_indic_scripts():
+    tamil = "மிளகாய் இலைகள் சுருண்டு மஞ்சளாகின்றன. " * 120
+    prompt, stats = assemble_prompt(tamil, weather=WEATHER, lang="ta", budget=800)
+    assert stats["trimmed"] == ["text"]
+    assert stats["prompt_tokens"] <= 800
+
+
+def test_unknown_language_falls_back_to_default_template():
+    prompt, _ = assemble_prompt("Leaf curl", weather=WEATHER, lang="xx")
+    assert prompt == assemble_prompt("Leaf curl", weather=WEATHER, lang="ta")[0]
+
+
+def test_indic_text_costs_more_tokens_than_english():
+    assert estimate_tokens("மிளகாய் இலை") > estimate_tokens("chilli leaf")
+
+
+def test_trim_keeps_whole_sentences():
+    text = "First sentence here. Second sentence here. Third sentence here."
+    trimmed = trim_to_tokens(text, 12)
+    assert trimmed.startswith("First sentence here.")
+    assert "Third" not in trimmed
+    assert trim_to_tokens(text, 1000) == text
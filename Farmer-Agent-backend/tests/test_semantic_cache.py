@@ -0,0 +1,53 @@
+from utils.semantic_cache import SemanticCache, cosine, embed, weather_bucket
+
+WEATHER = {"temp": 31.5, "humidity": 62, "condition": "scattered clouds"}
+ANSWER = "Spray neem oil in the evening."
+
+
+def test_same_question_hits():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("My chilli leaves are curling", "en", WEATHER, ANSWER)
+    assert cache.lookup("my chilli leaves are curling!", "en", WEATHER) == ANSWER
+
+
+def test_threshold_decides_near_duplicates():
+    question, variant = "My chilli leaves are curling", "My chilli leaves are curling up"
+    score = cosine(embed(question), embed(variant))
+    assert 0 < score < 1
+
+    below = SemanticCache(threshold=score - 0.01)
+    below.store(question, "en", WEATHER, ANSWER)
+    assert below.lookup(variant, "en", WEATHER) == ANSWER
+
+    above = SemanticCache(threshold=score + 0.01)
+    above.store(question, "en", WEATHER, ANSWER)
+    assert above.lookup(variant, "en", WEATHER) is None
+
+
+def test_threshold_above_one_disables_hits():
+    cache = SemanticCache(threshold=2)
+    cache.store("My chilli leaves are curling", "en", WEATHER, ANSWER)
+    assert cache.lookup("My chilli leaves are curling", "en", WEATHER) is None
+
+
+def test_unrelated_question_misses():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("My chilli leaves are curling", "en", WEATHER, ANSWER)
+    assert cache.lookup("When should I irrigate paddy?", "en", WEATHER) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_language_and_weather_partition_answers():
+    cache = SemanticCache(threshold=0.9)
+    cache.store("My chilli leaves are curling", "en", WEATHER, ANSWER)
+    assert cache.lookup("My chilli leaves are curling", "ta", WEATHER) is None
+    hot = dict(WEATHER, temp=39)
+    assert weather_bucket(hot) != weather_bucket(WEATHER)
+    assert cache.lookup("My chilli leaves are curling", "en", hot) is None
+
+
+def test_expired_entries_are_dropped():
+    cache = SemanticCache(threshold=0.9, ttl=-1)
+    cache.store("My chilli leaves are curling", "en", WEATHER, ANSWER)
+    assert cache.lookup("My chilli leaves are curling", "en", WEATHER) is None
+    assert cache.stats()["entries"] == 0
@@ -1,89 +1,311 @@
-import requests
-import os
-from dotenv import load_dotenv
-
-# Load API key from .env
-load_dotenv()
-import os
-print("✅ LOADED KEY:", os.getenv("OPENROUTER_API_KEY"))
-
-def call_openrouter(prompt, lang="ta", model="deepseek/deepseek-chat"):
-    try:    
-        from dotenv import load_dotenv
-        load_dotenv()
-        API_KEY = os.getenv("OPENROUTER_API_KEY")
-
-        if not API_KEY:
-            return "❌ OpenRouter API key not found. Please check your .env file."
-
-        system_prompt = {
-            "ta": "நீங்கள் ஒரு விவசாய ஆலோசகர். தமிழில் பதிலளிக்கவும்.",
-            "hi": "आप एक कृषि सलाहकार हैं। कृपया हिंदी में उत्तर दें।",
-            "te": "మీరు ఒక వ్యవసాయ సలహాదారు. దయచేసి తెలుగులో సమాధానం ఇవ్వండి.",
-            "ml": "നിങ്ങൾ ഒരു കാർഷിക ഉപദേശകനാണ്. ദയവായി മലയാളത്തിൽ മറുപടി നൽകുക."
-        }.get(lang, "You are a multilingual agricultural advisor AI.")
-
-        headers = {
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            "temperature": 0.7,
-            "max_tokens": 512
-        }
-
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-
-        if response.status_code != 200:
-            return f"❌ OpenRouter HTTP error {response.status_code}: {response.text}"
-
-        data = response.json()
-        if "choices" in data and len(data["choices"]) > 0:
-            return data["choices"][0]["message"]["content"]
-        elif "error" in data:
-            return f"❌ OpenRouter error: {data['error']}"
-        else:
-            return f"❌ OpenRouter error: Unexpected response format: {data}"
+import json
+import time
+from utils import http_client, profiling
+from utils.async_http import get_async_client
+from utils.semantic_cache import response_cache
+from utils.health import openrouter_breaker
+from utils.limiter import limiters, LimiterRejected, retry_after_seconds
+from utils.settings import settings
 
+OPENROUTER_URL = f"{settings.openrouter_base_url}/chat/completions"
+OLLAMA_URL = f"{settings.ollama_base_url}/api/generate"
+OLLAMA_MODEL = settings.ollama_model
+
+SYSTEM_PROMPTS = {
+    "ta": "நீங்கள் ஒரு விவசாய ஆலோசகர். தமிழில் பதிலளிக்கவும்.",
+    "hi": "आप एक कृषि सलाहकार हैं। कृपया हिंदी में उत्तर दें।",
+    "te": "మీరు ఒక వ్యవసాయ సలహాదారు. దయచేసి తెలుగులో సమాధానం ఇవ్వండి.",
+    "ml": "നിങ്ങൾ ഒരു കാർഷിക ഉപദേശകനാണ്. ദയവായി മലയാളത്തിൽ മറുപടി നൽകുക."
+}
+DEFAULT_SYSTEM_PROMPT = "You are a multilingual agricultural advisor AI."
+OPENROUTER_MODEL = "deepseek/deepseek-chat"
+MISSING_KEY = "❌ OpenRouter API key not found. Please check your .env file."
+
+# ---------- Requests ----------
+# The sync, streaming and async clients all send the same requests and read
+# the same responses; only the transport differs.
+
+def _openrouter_request(prompt, lang="ta", model=OPENROUTER_MODEL, stream=False):
+    """(headers, payload) for an OpenRouter chat completion, or None if no API key is configured."""
+    API_KEY = settings.openrouter_api_key
+    if not API_KEY:
+        return None
+
+    headers = {
+        "Authorization": f"Bearer {API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPTS.get(lang, DEFAULT_SYSTEM_PROMPT)},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 512
+    }
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+
+def _openrouter_http_error(response):
+    """The "❌ ..." answer for a non-200 OpenRouter response (a 429 also pauses the limiter), else None."""
+    if response.status_code == 429:
+        limiters["openrouter"].throttle(retry_after_seconds(response))
+        return "❌ OpenRouter busy: HTTP 429"
+    if response.status_code != 200:
+        return f"❌ OpenRouter HTTP error {response.status_code}: {response.text}"
+    return None
+
+
+def _openrouter_answer(response):
+    """The completion text of a requests or httpx response, or a "❌ ..." error."""
+    error = _openrouter_http_error(response)
+    if error:
+        return error
+
+    data = response.json()
+    if "choices" in data and len(data["choices"]) > 0:
+        return data["choices"][0]["message"]["content"]
+    elif "error" in data:
+        return f"❌ OpenRouter error: {data['error']}"
+    else:
+        return f"❌ OpenRouter error: Unexpected response format: {data}"
+
+
+def _ollama_request(prompt, lang="ta", stream=False):
+    system_prompt = SYSTEM_PROMPTS.get(lang, DEFAULT_SYSTEM_PROMPT)
+    return {
+        "model": OLLAMA_MODEL,
+        "prompt": f"{system_prompt}\n\n{prompt}",
+        "stream": stream
+    }
+
+
+def _ollama_answer(response):
+    return response.json().get("response", "❌ Ollama: No response returned")
+
+
+def call_openrouter(prompt, lang="ta", model=OPENROUTER_MODEL):
+    try:
+        request = _openrouter_request(prompt, lang, model)
+        if request is None:
+            return MISSING_KEY
+        headers, payload = request
+
+        with limiters["openrouter"].slot():
+            response = http_client.post(OPENROUTER_URL, headers=headers, json=payload)
+        return _openrouter_answer(response)
+
+    except LimiterRejected as e:
+        return f"❌ OpenRouter busy: {e}"
     except Exception as e:
         return f"❌ OpenRouter exception: {str(e)}"
 
 
 def call_ollama(prompt, lang="ta"):
     try:
-        system_prompt = {
-            "ta": "நீங்கள் ஒரு விவசாய ஆலோசகர். தமிழில் பதிலளிக்கவும்.",
-            "hi": "आप एक कृषि सलाहकार हैं। कृपया हिंदी में उत्तर दें।",
-            "te": "మీరు ఒక వ్యవసాయ సలహాదారు. దయచేసి తెలుగులో సమాధానం ఇవ్వండి.",
-            "ml": "നിങ്ങൾ ഒരു കാർഷിക ഉപദേശകനാണ്. ദയവായി മലയാളത്തിൽ മറുപടി നൽകുക."
-        }.get(lang, "You are a multilingual agricultural advisor AI.")
+        with limiters["ollama"].slot():
+            response = http_client.post(OLLAMA_URL, json=_ollama_request(prompt, lang))
+        return _ollama_answer(response)
+
+    except Exception as e:
+        return f"❌ Ollama error: {str(e)}"
+
+def is_error(answer):
+    return not answer or answer.startswith("❌")
+
+# ---------- Routing and caching ----------
+# One set of rules for get_ai_response, stream_ai_response and
+# get_ai_response_async: semantic cache first; OpenRouter unless offline or
+# its circuit is open; any OpenRouter failure falls through to the local
+# model; only complete, successful answers are cached.
+
+def record_openrouter(answer, elapsed):
+    """Feed the circuit breaker; being over our own quota says nothing about OpenRouter's health."""
+    if answer.startswith("❌ OpenRouter busy"):
+        openrouter_breaker.release()
+    else:
+        openrouter_breaker.record(not is_error(answer), elapsed)
+
+def _route(online, query, lang, weather):
+    """(cached answer or None, whether to try OpenRouter before the local model)."""
+    if query:
+        with profiling.span("semantic_cache.lookup"):
+            cached = response_cache.lookup(query, lang, weather)
+        if cached is not None:
+            return cached, False
+    return None, bool(online) and openrouter_breaker.allow_request()
+
+def _needs_fallback(answer):
+    """OpenRouter was skipped (None) or failed: ask the local model."""
+    return answer is None or is_error(answer)
+
+def _prefer(answer, local):
+    """The local answer, unless it failed too and OpenRouter's error says more."""
+    return local if answer is None or not is_error(local) else answer
+
+def _remember(query, lang, weather, answer, failed=False):
+    if query and not failed and not is_error(answer):
+        response_cache.store(query, lang, weather, answer)
+
+def get_ai_response(prompt, online, lang="ta", query=None, weather=None):
+    """
+    query/weather enable the semantic cache: query is the farmer's own input
+    (see prompt_utils.summarize_inputs) and weather selects the weather band.
+    """
+    cached, try_openrouter = _route(online, query, lang, weather)
+    if cached is not None:
+        return cached
+
+    answer = None
+    if try_openrouter:
+        start = time.perf_counter()
+        answer = call_openrouter(prompt, lang=lang)
+        record_openrouter(answer, time.perf_counter() - start)
+    if _needs_fallback(answer):
+        answer = _prefer(answer, call_ollama(prompt, lang=lang))
+
+    _remember(query, lang, weather, answer)
+    return answer
+
+
+def stream_openrouter(prompt, lang="ta", model=OPENROUTER_MODEL):
+    """Yield the OpenRouter completion piece by piece as tokens arrive (SSE)."""
+    try:
+        request = _openrouter_request(prompt, lang, model, stream=True)
+        if request is None:
+            yield MISSING_KEY
+            return
+        headers, payload = request
+
+        # the slot is held until the stream ends (or the client goes away)
+        with limiters["openrouter"].slot(), \
+                http_client.post(OPENROUTER_URL, headers=headers, json=payload, stream=True) as response:
+            error = _openrouter_http_error(response)
+            if error:
+                yield error
+                return
+
+            for line in response.iter_lines():
+                # Decode ourselves: text/event-stream without a charset would
+                # otherwise be read as latin-1 and mangle Indic scripts.
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue  # keep-alive comments like ": OPENROUTER PROCESSING"
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    yield f"❌ OpenRouter error: {chunk['error']}"
+                    return
+                choices = chunk.get("choices") or [{}]
+                text = choices[0].get("delta", {}).get("content")
+                if text:
+                    yield text
+
+    except LimiterRejected as e:
+        yield f"❌ OpenRouter busy: {e}"
+    except Exception as e:
+        yield f"❌ OpenRouter exception: {str(e)}"
+
+
+def stream_ollama(prompt, lang="ta"):
+    """Yield the Ollama completion piece by piece (newline-delimited JSON)."""
+    try:
+        with limiters["ollama"].slot(), \
+                http_client.post(OLLAMA_URL, json=_ollama_request(prompt, lang, stream=True), stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    yield f"❌ Ollama error: {chunk['error']}"
+                    return
+                if chunk.get("response"):
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    break
+
+    except Exception as e:
+        yield f"❌ Ollama error: {str(e)}"
+
+def stream_ai_response(prompt, online, lang="ta", query=None, weather=None):
+    cached, try_openrouter = _route(online, query, lang, weather)
+    if cached is not None:
+        yield cached
+        return
+
+    stream, first = None, ""
+    if try_openrouter:
+        start = time.perf_counter()
+        stream = stream_openrouter(prompt, lang=lang)
+        first = next(stream, "")
+        # Judged on time-to-first-token; a failed start falls back to Ollama.
+        record_openrouter(first, time.perf_counter() - start)
+        if _needs_fallback(first):
+            stream.close()
+            stream = None
+
+    if stream is None:
+        stream = stream_ollama(prompt, lang=lang)
+        first = next(stream, "")
+
+    # The stream generators report failures as a "❌ ..." piece, possibly
+    # after some text; a partial answer must never reach the cache.
+    pieces, failed = [], False
+    if first:
+        pieces.append(first)
+        failed = is_error(first)
+        yield first
+    for piece in stream:
+        pieces.append(piece)
+        failed = failed or piece.startswith("❌")
+        yield piece
+
+    _remember(query, lang, weather, "".join(pieces), failed)
+
+
+async def call_openrouter_async(prompt, lang="ta", model=OPENROUTER_MODEL):
+    try:
+        request = _openrouter_request(prompt, lang, model)
+        if request is None:
+            return MISSING_KEY
+        headers, payload = request
 
-        full_prompt = f"{system_prompt}\n\n{prompt}"
+        async with limiters["openrouter"].slot_async():
+            response = await get_async_client().post(OPENROUTER_URL, headers=headers, json=payload)
+        return _openrouter_answer(response)
 
-        response = requests.post("http://localhost:11434/api/generate", json={
-            "model": "gemma:3b",
-            "prompt": full_prompt,
-            "stream": False
-        })
+    except LimiterRejected as e:
+        return f"❌ OpenRouter busy: {e}"
+    except Exception as e:
+        return f"❌ OpenRouter exception: {str(e)}"
 
-        result = response.json()
-        return result.get("response", "❌ Ollama: No response returned")
+
+async def call_ollama_async(prompt, lang="ta"):
+    try:
+        async with limiters["ollama"].slot_async():
+            response = await get_async_client().post(OLLAMA_URL, json=_ollama_request(prompt, lang))
+        return _ollama_answer(response)
 
     except Exception as e:
         return f"❌ Ollama error: {str(e)}"
 
-def get_ai_response(prompt, online, lang="ta"):
-    if online:
-        return call_openrouter(prompt, lang=lang)
-    else:
-        return call_ollama(prompt, lang=lang)
+async def get_ai_response_async(prompt, online, lang="ta", query=None, weather=None):
+    cached, try_openrouter = _route(online, query, lang, weather)
+    if cached is not None:
+        return cached
+
+    answer = None
+    if try_openrouter:
+        start = time.perf_counter()
+        answer = await call_openrouter_async(prompt, lang=lang)
+        record_openrouter(answer, time.perf_counter() - start)
+    if _needs_fallback(answer):
+        answer = _prefer(answer, await call_ollama_async(prompt, lang=lang))
+
+    _remember(query, lang, weather, answer)
+    return answer
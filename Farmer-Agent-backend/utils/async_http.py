@@ -0,0 +1,23 @@
+import httpx
+from utils.http_client import CONNECT_TIMEOUT, READ_TIMEOUT
+
+# One AsyncClient per process so every async util shares the same connection
+# pool. It is created lazily inside the running event loop.
+_client = None
+
+ASYNC_TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT)
+ASYNC_LIMITS = httpx.Limits(max_connections=500, max_keepalive_connections=100)
+
+
+def get_async_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=ASYNC_TIMEOUT, limits=ASYNC_LIMITS)
+    return _client
+
+
+async def close_async_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,25 +1,144 @@
 import os
-from dotenv import load_dotenv
-import assemblyai as aai
+import io
+import asyncio
+import hashlib
+import threading
+import time
+from utils import http_client
+from utils.async_http import get_async_client
+from utils.cache_utils import TTLCache, SQLiteStore
+from utils.limiter import limiters
+from utils import metrics
+from utils.settings import settings
 
-load_dotenv()
-aai.settings.api_key = os.getenv("ASSEMBLYAI_KEY")
+ASSEMBLYAI_URL = f"{settings.assemblyai_base_url}/v2"
+POLL_INTERVAL = 1.0  # seconds between transcript status checks
+# A transcript stuck in queued/processing gives up after this long (sync and
+# async paths), so it can't hold an AssemblyAI limiter slot (and the farmer's
+# request) forever.
+TRANSCRIBE_MAX_WAIT = float(os.getenv("TRANSCRIBE_MAX_WAIT", "120"))
+
+# Retried submissions of the same recording are served from here instead of
+# being uploaded (and billed) again. Identical uploads arriving at the same
+# time share one transcription.
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", str(24 * 3600)))
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "1000"))
+TRANSCRIPT_CACHE_DB = os.getenv("TRANSCRIPT_CACHE_DB", "")
+
+transcript_cache = TTLCache(
+    ttl=TRANSCRIPT_CACHE_TTL,
+    max_entries=TRANSCRIPT_CACHE_SIZE,
+    store=SQLiteStore(TRANSCRIPT_CACHE_DB, table="transcripts") if TRANSCRIPT_CACHE_DB else None,
+)
+
+def audio_cache_key(data, lang):
+    return f"{lang}:{hashlib.sha256(data).hexdigest()}"
+
+# The AssemblyAI SDK is imported and configured on the first sync
+# transcription; the async path talks to the REST API and never needs it.
+_aai = None
+_aai_lock = threading.Lock()
+
+def get_assemblyai():
+    global _aai
+    if _aai is None:
+        with _aai_lock:
+            if _aai is None:
+                import assemblyai as aai
+                aai.settings.api_key = settings.assemblyai_key
+                aai.settings.base_url = settings.assemblyai_base_url
+                _aai = aai
+    return _aai
+
+def _transcribe_bytes(data, lang):
+    aai = get_assemblyai()
+    transcriber = aai.Transcriber()
+    # one slot per transcription job. The SDK uploads and submits; polling is
+    # ours, since its transcribe() and get_by_id() wait for completion with
+    # no deadline and a stuck transcript would hold the slot forever.
+    with limiters["assemblyai"].slot():
+        transcript = transcriber.submit(
+            io.BytesIO(data),  # straight from memory, no temp file on disk
+            config=aai.TranscriptionConfig(language_code=lang)
+        )
+        return _poll_transcript(transcript.id)
+
+def _poll_transcript(transcript_id):
+    headers = {"authorization": settings.assemblyai_key or ""}
+    deadline = time.monotonic() + TRANSCRIBE_MAX_WAIT
+    while True:
+        poll = http_client.get(f"{ASSEMBLYAI_URL}/transcript/{transcript_id}", headers=headers)
+        poll.raise_for_status()
+        result = poll.json()
+        if result["status"] == "completed":
+            return result.get("text") or ""
+        if result["status"] == "error":
+            raise RuntimeError(result.get("error"))
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"transcript {transcript_id} still {result['status']} after {TRANSCRIBE_MAX_WAIT:.0f}s")
+        time.sleep(POLL_INTERVAL)
 
 def transcribe_audio(audio_file, lang="ta"):  # default is Tamil
     """
     Transcribes the uploaded audio file using AssemblyAI for the given language.
     Supported: "ta" (Tamil), "hi" (Hindi)
+
+    The upload is read into memory, so concurrent requests never share a file.
     """
-    path = "static/temp_audio.wav"
-    audio_file.save(path)
+    try:
+        data = audio_file.read()
+        metrics.payload_bytes.observe(len(data), kind="audio_upload")
+        key = audio_cache_key(data, lang)
+        # Failures raise inside the loader, so they are never cached.
+        return transcript_cache.get_or_load(key, lambda: _transcribe_bytes(data, lang))
+    except Exception as e:
+        metrics.stage_errors.inc(stage="audio")
+        print(f"❌ Transcription failed: {e}")
+        return ""
+
+async def _transcribe_bytes_async(data, lang):
+    async with limiters["assemblyai"].slot_async():
+        return await _run_transcription_async(data, lang)
+
+async def _run_transcription_async(data, lang):
+    client = get_async_client()
+    headers = {"authorization": settings.assemblyai_key or ""}
+
+    upload = await client.post(f"{ASSEMBLYAI_URL}/upload", headers=headers, content=data)
+    upload.raise_for_status()
+
+    submit = await client.post(
+        f"{ASSEMBLYAI_URL}/transcript",
+        headers=headers,
+        json={"audio_url": upload.json()["upload_url"], "language_code": lang}
+    )
+    submit.raise_for_status()
+    transcript_id = submit.json()["id"]
 
+    deadline = time.monotonic() + TRANSCRIBE_MAX_WAIT
+    while True:
+        poll = await client.get(f"{ASSEMBLYAI_URL}/transcript/{transcript_id}", headers=headers)
+        poll.raise_for_status()
+        result = poll.json()
+        if result["status"] == "completed":
+            return result.get("text") or ""
+        if result["status"] == "error":
+            raise RuntimeError(result.get("error"))
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"transcript {transcript_id} still {result['status']} after {TRANSCRIBE_MAX_WAIT:.0f}s")
+        await asyncio.sleep(POLL_INTERVAL)
+
+async def transcribe_audio_async(audio_file, lang="ta"):
+    """
+    Async variant of transcribe_audio that talks to the AssemblyAI REST API
+    through the shared async client: upload, submit, then poll until done.
+    """
     try:
-        transcriber = aai.Transcriber()
-        transcript = transcriber.transcribe(
-            path,
-            config=aai.TranscriptionConfig(language_code=lang)
-        )
-        return transcript.text
+        data = audio_file.read()
+        metrics.payload_bytes.observe(len(data), kind="audio_upload")
+        key = audio_cache_key(data, lang)
+        return await transcript_cache.get_or_load_async(key, lambda: _transcribe_bytes_async(data, lang))
     except Exception as e:
+        metrics.stage_errors.inc(stage="audio")
         print(f"❌ Transcription failed: {e}")
-        return ""
\ No newline at end of file
+        return ""
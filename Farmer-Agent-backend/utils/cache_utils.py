@@ -0,0 +1,247 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Background refreshes for stale-while-revalidate entries.
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+# How often (seconds) a cache with a SQLiteStore drops rows past ttl + stale_ttl.
+CACHE_PRUNE_INTERVAL = int(os.getenv("CACHE_PRUNE_INTERVAL", "600"))
+
+
+class SQLiteStore:
+    """
+    Tiny shared key/value store on disk so several worker processes (or a
+    restarted one) can reuse each other's cached values.
+    """
+
+    def __init__(self, path, table="cache"):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_stored_at ON {table} (stored_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, stored_at):
+        with self._conn() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), stored_at),
+            )
+
+    def prune(self, older_than):
+        with self._conn() as conn:
+            return conn.execute(f"DELETE FROM {self.table} WHERE stored_at < ?", (older_than,)).rowcount
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a TTL and LRU eviction.
+
+    Entries younger than `ttl` are fresh. Entries older than `ttl` but younger
+    than `ttl + stale_ttl` are served as-is while one background refresh runs
+    (stale-while-revalidate), so hot keys never block on the upstream.
+    Concurrent misses for the same key share a single load.
+    An optional SQLiteStore is used as a shared second level; rows too old
+    to be served are pruned from it every `prune_interval` seconds.
+    """
+
+    def __init__(self, ttl, max_entries=1024, stale_ttl=0, store=None, prune_interval=CACHE_PRUNE_INTERVAL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.store = store
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._inflight = {}
+        self._inflight_async = {}
+        self._refresh_tasks = set()  # the event loop only keeps weak references to tasks
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _put(self, key, value, stored_at):
+        self._data[key] = (value, stored_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._put(key, value, now)
+        if self.store is not None:
+            self.store.set(key, value, now)
+            self._maybe_prune(now)
+
+    def _maybe_prune(self, now):
+        with self._lock:
+            if now < self._next_prune:
+                return
+            self._next_prune = now + self.prune_interval
+        try:
+            self.store.prune(now - self.ttl - self.stale_ttl)
+        except sqlite3.Error as e:
+            print(f"Cache prune failed for {self.store.table}: {e}")
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                return entry
+        if self.store is not None:
+            entry = self.store.get(key)
+            if entry is not None:
+                with self._lock:
+                    self._put(key, *entry)
+                return entry
+        return None
+
+    def _refresh(self, key, loader):
+        try:
+            self.set(key, loader())
+        except Exception as e:
+            print(f"Cache refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_load(self, key, loader):
+        """Return the cached value for key, calling loader() on a miss."""
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    _refresh_pool.submit(self._refresh, key, loader)
+                return value
+
+        with self._lock:
+            self.misses += 1
+            pending = self._inflight.get(key)
+            if pending is None:
+                pending = self._inflight[key] = Future()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            return pending.result()  # re-raises the owner's exception too
+
+        try:
+            value = loader()
+            self.set(key, value)
+            pending.set_result(value)
+            return value
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def _refresh_async(self, key, loader):
+        try:
+            self.set(key, await loader())
+        except Exception as e:
+            print(f"Cache refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def get_or_load_async(self, key, loader):
+        """Async twin of get_or_load; loader is a coroutine function."""
+        entry = self._lookup(key)
+        now = time.time()
+        if entry is not None:
+            value, stored_at = entry
+            age = now - stored_at
+            if age < self.ttl:
+                with self._lock:
+                    self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self.stale_hits += 1
+                    start_refresh = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start_refresh:
+                    task = asyncio.create_task(self._refresh_async(key, loader))
+                    self._refresh_tasks.add(task)
+                    task.add_done_callback(self._refresh_tasks.discard)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        pending = self._inflight_async.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = self._inflight_async[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+            self.set(key, value)
+            pending.set_result(value)
+            return value
+        except BaseException as e:
+            pending.set_exception(e)
+            pending.exception()  # mark retrieved so asyncio doesn't warn when nobody waited
+            raise
+        finally:
+            self._inflight_async.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else 0.0,
+            }
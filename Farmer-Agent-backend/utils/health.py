@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+
+from utils.internet import has_internet, provider_up
+from utils.settings import settings
+
+# Keeps an up-to-date view of whether the uplink, OpenRouter and the local
+# Ollama are reachable, so get_ai_response can route around an outage
+# immediately instead of waiting for OpenRouter to time out.
+
+PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+PROBE_TIMEOUT = float(os.getenv("HEALTH_PROBE_TIMEOUT", "3"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_SLOW_SECONDS = float(os.getenv("BREAKER_SLOW_SECONDS", "20"))
+
+# name: (url, check); any answer proves the uplink, providers must answer 2xx
+PROBES = {
+    "internet": (settings.internet_probe_url, has_internet),
+    "openrouter": (f"{settings.openrouter_base_url}/models", provider_up),
+    "ollama": (f"{settings.ollama_base_url}/api/tags", provider_up),
+}
+
+
+class CircuitBreaker:
+    """
+    closed    -> calls go through; BREAKER_FAILURES failures (or slow calls) in a row open it
+    open      -> calls are refused until BREAKER_OPEN_SECONDS pass (or a probe succeeds)
+    half_open -> one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, open_seconds=BREAKER_OPEN_SECONDS,
+                 slow_seconds=BREAKER_SLOW_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.slow_seconds = slow_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = "half_open"
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, ok, elapsed=0.0):
+        """Report the outcome of a call; slow successes count as failures."""
+        ok = ok and elapsed < self.slow_seconds
+        with self._lock:
+            self._trial_running = False
+            if ok:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        if self.state != "open":
+            print(f"⚠️ {self.name} circuit opened after {self.failures} failures")
+        self.state = "open"
+        self.opened_at = time.monotonic()
+
+    def release(self):
+        """The call never reached the provider (e.g. refused by our limiter): record nothing."""
+        with self._lock:
+            self._trial_running = False
+
+    def trip(self):
+        with self._lock:
+            self._open()
+
+    def probe_ok(self):
+        """A background probe succeeded: let the next real call try again."""
+        with self._lock:
+            if self.state == "open":
+                self.state = "half_open"
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "failures": self.failures}
+
+
+openrouter_breaker = CircuitBreaker("openrouter")
+
+
+class HealthMonitor:
+    def __init__(self, interval=PROBE_INTERVAL):
+        self.interval = interval
+        self.status = {
+            name: {"up": None, "latency_ms": None, "checked_at": None} for name in PROBES
+        }
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def probe_once(self):
+        for name, (url, check) in PROBES.items():
+            start = time.perf_counter()
+            up = check(url, timeout=PROBE_TIMEOUT)
+            with self._lock:
+                self.status[name] = {
+                    "up": up,
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                    "checked_at": time.time(),
+                }
+
+        if self.status["openrouter"]["up"]:
+            openrouter_breaker.probe_ok()
+        else:
+            openrouter_breaker.trip()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except Exception as e:
+                print(f"⚠️ Health probe failed: {e}")
+            self._stop.wait(self.interval)
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def start(self):
+        """Start the probe thread; safe to call on every request, only the first call does anything."""
+        if self.running():
+            return
+        with self._start_lock:
+            if self.running():
+                return
+            if self._thread is not None:
+                self._thread.join()  # a stopped thread may still be finishing its last probe
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="health-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        with self._lock:
+            providers = {name: dict(status) for name, status in self.status.items()}
+        return {"providers": providers, "breakers": {"openrouter": openrouter_breaker.snapshot()}}
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,119 @@
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Every sync upstream call (OpenRouter, Ollama, OpenWeather, connectivity
+# checks) goes through this module so connections are pooled per host and
+# kept alive between farmer requests instead of paying TCP+TLS each time.
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+MAX_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))         # per-host pools kept around
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))    # keep-alive connections per host
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+
+
+class JitteredRetry(Retry):
+    """Retry with "full jitter" backoff so retrying workers don't stampede together."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+def _make_session(retries):
+    # Only idempotent methods are retried on 429/5xx; POSTs (LLM calls) are
+    # retried on connection failures only, since nothing reached the server.
+    retry = JitteredRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=MAX_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+session = _make_session(MAX_RETRIES)
+_no_retry_session = _make_session(0)
+
+_stats_lock = threading.Lock()
+_host_stats = {}
+
+
+def _record(host, elapsed, error):
+    with _stats_lock:
+        stats = _host_stats.setdefault(host, {"requests": 0, "errors": 0, "total_ms": 0.0})
+        stats["requests"] += 1
+        stats["errors"] += int(error)
+        stats["total_ms"] += elapsed * 1000
+
+
+def request(method, url, retries=True, **kwargs):
+    """
+    Drop-in for requests.request() on the shared pooled session.
+    Applies DEFAULT_TIMEOUT unless the caller passes its own timeout.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    client = session if retries else _no_retry_session
+    host = urlsplit(url).netloc
+    start = time.perf_counter()
+    try:
+        response = client.request(method, url, **kwargs)
+    except requests.RequestException:
+        _record(host, time.perf_counter() - start, True)
+        raise
+    _record(host, time.perf_counter() - start, response.status_code >= 400)
+    return response
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def pool_stats():
+    """Per-host request counters plus connection-pool usage from urllib3."""
+    with _stats_lock:
+        stats = {host: dict(values) for host, values in _host_stats.items()}
+
+    for client in (session, _no_retry_session):
+        pools = client.get_adapter("https://").poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = pool.host if pool.port in (None, 80, 443) else f"{pool.host}:{pool.port}"
+            entry = stats.setdefault(host, {"requests": 0, "errors": 0, "total_ms": 0.0})
+            # num_connections counts fresh TCP(+TLS) connects; the gap to
+            # num_requests is how many calls reused a kept-alive connection.
+            entry["connections_opened"] = entry.get("connections_opened", 0) + pool.num_connections
+            entry["pool_requests"] = entry.get("pool_requests", 0) + pool.num_requests
+            entry["idle_connections"] = entry.get("idle_connections", 0) + sum(
+                1 for conn in list(pool.pool.queue) if conn is not None
+            )
+
+    for entry in stats.values():
+        entry["total_ms"] = round(entry["total_ms"], 1)
+        if entry["requests"]:
+            entry["avg_ms"] = round(entry["total_ms"] / entry["requests"], 1)
+    return stats
@@ -0,0 +1,154 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+
+from PIL import Image
+
+# Farmers often resend the same photo, or a resized/recompressed copy of it
+# from a messaging app. Diagnoses are stored on disk keyed by the exact byte
+# hash and by a 64-bit perceptual hash (dHash), so both cases skip Gemini.
+# The perceptual match compares against the IMAGE_PHASH_SCAN most recently
+# used entries only, so a lookup costs the same however big the cache grows.
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGE_CACHE_DB = os.getenv("IMAGE_CACHE_DB", os.path.join(BACKEND_DIR, "cache", "image_diagnoses.db"))
+IMAGE_CACHE_SIZE = int(os.getenv("IMAGE_CACHE_SIZE", "5000"))
+IMAGE_PHASH_DISTANCE = int(os.getenv("IMAGE_PHASH_DISTANCE", "6"))  # max differing bits out of 64
+IMAGE_PHASH_SCAN = int(os.getenv("IMAGE_PHASH_SCAN", "1000"))
+
+
+def dhash(image_bytes, size=8):
+    """Difference hash: compares neighbouring pixels of a tiny grayscale thumbnail."""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        pixels = list(img.convert("L").resize((size + 1, size), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class DiagnosisCache:
+    def __init__(self, path=IMAGE_CACHE_DB, max_entries=IMAGE_CACHE_SIZE, max_distance=IMAGE_PHASH_DISTANCE,
+                 max_scan=IMAGE_PHASH_SCAN):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_scan = max_scan
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS diagnoses ("
+                "sha256 TEXT PRIMARY KEY, phash TEXT, diagnosis TEXT NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS diagnoses_last_used ON diagnoses (last_used)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, field):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    @staticmethod
+    def keys(image_bytes, hash_bytes=None):
+        """
+        (sha256 of image_bytes, perceptual hash or None if undecodable). Pass
+        the downscaled copy as hash_bytes so the dHash doesn't decode the
+        full-resolution upload a second time.
+        """
+        sha = hashlib.sha256(image_bytes).hexdigest()
+        try:
+            phash = dhash(image_bytes if hash_bytes is None else hash_bytes)
+        except Exception:
+            phash = None
+        return sha, phash
+
+    def lookup(self, sha, phash):
+        conn = self._conn()
+        row = conn.execute("SELECT diagnosis FROM diagnoses WHERE sha256 = ?", (sha,)).fetchone()
+        if row is not None:
+            hit_sha = sha
+            self._count("exact_hits")
+        elif phash is not None:
+            best = None
+            # newest first along the last_used index, never more than max_scan rows
+            for cached_sha, cached_phash in conn.execute(
+                "SELECT sha256, phash FROM diagnoses WHERE phash IS NOT NULL ORDER BY last_used DESC LIMIT ?",
+                (self.max_scan,),
+            ):
+                distance = bin(int(cached_phash, 16) ^ phash).count("1")
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, cached_sha)
+            if best is None:
+                self._count("misses")
+                return None
+            hit_sha = best[1]
+            row = conn.execute("SELECT diagnosis FROM diagnoses WHERE sha256 = ?", (hit_sha,)).fetchone()
+            self._count("perceptual_hits")
+        else:
+            self._count("misses")
+            return None
+
+        with conn:
+            conn.execute("UPDATE diagnoses SET last_used = ? WHERE sha256 = ?", (time.time(), hit_sha))
+        return row[0]
+
+    def store(self, sha, phash, diagnosis):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO diagnoses (sha256, phash, diagnosis, last_used) VALUES (?, ?, ?, ?)",
+                (sha, f"{phash:016x}" if phash is not None else None, diagnosis, time.time()),
+            )
+            # LRU eviction: drop the least recently used rows beyond the cap.
+            conn.execute(
+                "DELETE FROM diagnoses WHERE sha256 IN ("
+                "SELECT sha256 FROM diagnoses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        count = self._conn().execute("SELECT COUNT(*) FROM diagnoses").fetchone()[0]
+        with self._stats_lock:
+            hits = self.exact_hits + self.perceptual_hits
+            lookups = hits + self.misses
+            return {
+                "entries": count,
+                "exact_hits": self.exact_hits,
+                "perceptual_hits": self.perceptual_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+# Opened on first use, not at import, so importing the app (tests, scripts,
+# startup benchmarks) doesn't create the cache directory or database.
+_diagnosis_cache = None
+_diagnosis_cache_lock = threading.Lock()
+
+
+def get_diagnosis_cache():
+    global _diagnosis_cache
+    if _diagnosis_cache is None:
+        with _diagnosis_cache_lock:
+            if _diagnosis_cache is None:
+                _diagnosis_cache = DiagnosisCache()
+    return _diagnosis_cache
@@ -0,0 +1,103 @@
+import io
+import os
+import threading
+import time
+
+from PIL import Image, ImageOps
+
+# Phone photos are 4-12 MB, but Gemini diagnoses just as well from ~1024px.
+# Shrinking before upload is what matters on rural links.
+
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(60_000_000)))
+IMAGE_MAX_ASPECT = float(os.getenv("IMAGE_MAX_ASPECT", "3.0"))  # wider panoramas are centre-cropped
+
+
+class ImageRejected(ValueError):
+    """An upload we won't process; status is the HTTP code to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+_stats_lock = threading.Lock()
+_stats = {"images": 0, "bytes_in": 0, "bytes_out": 0, "total_ms": 0.0}
+
+
+def _crop_to_aspect(img, max_aspect):
+    width, height = img.size
+    if width > height * max_aspect:
+        new_width = int(height * max_aspect)
+        left = (width - new_width) // 2
+        return img.crop((left, 0, left + new_width, height))
+    if height > width * max_aspect:
+        new_height = int(width * max_aspect)
+        top = (height - new_height) // 2
+        return img.crop((0, top, width, top + new_height))
+    return img
+
+
+def preprocess_image(data, max_edge=IMAGE_MAX_EDGE, quality=IMAGE_JPEG_QUALITY):
+    """
+    Fix EXIF orientation, crop extreme aspect ratios, downscale to max_edge
+    and re-encode as JPEG. Returns (bytes, mime_type, info) where info
+    reports the byte savings and time spent.
+    Raises ImageRejected for oversized or undecodable uploads.
+    """
+    start = time.perf_counter()
+    if len(data) > IMAGE_MAX_UPLOAD_BYTES:
+        raise ImageRejected(f"Image is too large ({len(data) // 1024} KB, limit {IMAGE_MAX_UPLOAD_BYTES // 1024} KB)",
+                            status=413)
+
+    try:
+        img = Image.open(io.BytesIO(data))
+        if img.width * img.height > IMAGE_MAX_PIXELS:
+            raise ImageRejected(f"Image has too many pixels ({img.width}x{img.height})", status=413)
+        original_size = img.size
+        original_format = img.format
+        upright = img.getexif().get(0x0112, 1) == 1  # EXIF Orientation
+        img.draft("RGB", (max_edge, max_edge))  # lets JPEG decode at reduced scale, much faster
+        img = ImageOps.exif_transpose(img)
+        img = _crop_to_aspect(img.convert("RGB"), IMAGE_MAX_ASPECT)
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+    except ImageRejected:
+        raise
+    except Exception as e:
+        raise ImageRejected(f"Could not read image: {e}")
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    processed = out.getvalue()
+    if (len(processed) >= len(data) and original_format == "JPEG" and upright
+            and img.size == original_size):
+        processed = data  # already small and upright; re-encoding only adds bytes
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    info = {
+        "original_bytes": len(data),
+        "processed_bytes": len(processed),
+        "saved_bytes": len(data) - len(processed),
+        "saved_pct": round(100 * (1 - len(processed) / len(data)), 1) if data else 0.0,
+        "original_size": list(original_size),
+        "processed_size": list(img.size),
+        "ms": round(elapsed_ms, 1),
+    }
+    with _stats_lock:
+        _stats["images"] += 1
+        _stats["bytes_in"] += len(data)
+        _stats["bytes_out"] += len(processed)
+        _stats["total_ms"] += elapsed_ms
+    return processed, "image/jpeg", info
+
+
+def preprocess_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["total_ms"] = round(stats["total_ms"], 1)
+    stats["saved_bytes"] = stats["bytes_in"] - stats["bytes_out"]
+    if stats["bytes_in"]:
+        stats["saved_pct"] = round(100 * stats["saved_bytes"] / stats["bytes_in"], 1)
+    return stats
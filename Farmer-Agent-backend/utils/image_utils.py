@@ -1,10 +1,15 @@
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
+import asyncio
+import base64
+import threading
+from utils.async_http import get_async_client
+from utils.image_cache import get_diagnosis_cache
+from utils.image_preprocess import preprocess_image
+from utils.limiter import limiters, retry_after_seconds
+from utils import metrics, profiling
+from utils.settings import settings, DEFAULT_GEMINI_BASE_URL
 
-load_dotenv()
-
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+GEMINI_MODEL = settings.gemini_model
+GEMINI_URL = f"{settings.gemini_base_url}/models"
 
 generation_config = {
     "temperature": 0.4,
@@ -18,11 +23,30 @@ safety_settings = [
     for category in ["HARASSMENT", "HATE_SPEECH", "DANGEROUS_CONTENT"]
 ]
 
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash",
-    generation_config=generation_config,
-    safety_settings=safety_settings,
-)
+# google.generativeai (and grpc under it) takes seconds to import, so the
+# SDK is only imported and configured when the first photo comes in.
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                if settings.gemini_base_url == DEFAULT_GEMINI_BASE_URL:
+                    genai.configure(api_key=settings.google_api_key)
+                else:
+                    # A proxy or local fake: the SDK's REST transport takes
+                    # the host (http:// is kept) and adds /v1beta itself.
+                    genai.configure(api_key=settings.google_api_key, transport="rest",
+                                    client_options={"api_endpoint": settings.gemini_base_url.rsplit("/v1", 1)[0]})
+                _model = genai.GenerativeModel(
+                    model_name=GEMINI_MODEL,
+                    generation_config=generation_config,
+                    safety_settings=safety_settings,
+                )
+    return _model
 
 input_prompt = (
     "You are a helpful crop expert who speaks simply for rural farmers.\n"
@@ -35,10 +59,86 @@ def analyze_image_with_gemini(image_file):
     """
     image_file: werkzeug FileStorage object (from request.files.get("image"))
     """
+    data = image_file.read()  # read bytes directly from the in-memory object
+    # Size and pixel limits are checked before anything decodes the image
+    # (ImageRejected), and the cache keys hash the downscaled copy, so the
+    # upload is decoded once. Sizes go to metrics and the profile, not stdout.
+    with profiling.span("image.preprocess") as span:
+        upload, mime_type, info = preprocess_image(data)
+        span.set(original_bytes=info["original_bytes"], processed_bytes=info["processed_bytes"])
+    metrics.payload_bytes.observe(info["original_bytes"], kind="image_upload")
+    metrics.payload_bytes.observe(info["processed_bytes"], kind="image_sent")
+
+    diagnosis_cache = get_diagnosis_cache()
+    sha, phash = diagnosis_cache.keys(data, upload)
+    cached = diagnosis_cache.lookup(sha, phash)
+    if cached is not None:
+        return cached
+
     image_data = {
-        "mime_type": image_file.mimetype,
-        "data": image_file.read()  # read bytes directly from the in-memory object
+        "mime_type": mime_type,
+        "data": upload
     }
 
-    response = model.generate_content([input_prompt, image_data])
+    try:
+        with limiters["gemini"].slot():
+            response = get_model().generate_content([input_prompt, image_data])
+    except Exception as e:
+        if type(e).__name__ == "ResourceExhausted":  # google.api_core's 429
+            limiters["gemini"].throttle(5)
+        raise
+    diagnosis_cache.store(sha, phash, response.text)
     return response.text
+
+async def analyze_image_with_gemini_async(image_file):
+    """
+    Async variant of analyze_image_with_gemini. Calls the Gemini REST endpoint
+    on the shared async client so it doesn't tie up a thread while waiting.
+    """
+    data = image_file.read()
+    # Pillow, hashing and SQLite all block: keep them off the event loop.
+    # Limits first, then hash the downscaled copy, as in the sync path.
+    with profiling.span("image.preprocess") as span:
+        upload, mime_type, info = await asyncio.to_thread(preprocess_image, data)
+        span.set(original_bytes=info["original_bytes"], processed_bytes=info["processed_bytes"])
+    metrics.payload_bytes.observe(info["original_bytes"], kind="image_upload")
+    metrics.payload_bytes.observe(info["processed_bytes"], kind="image_sent")
+
+    diagnosis_cache = await asyncio.to_thread(get_diagnosis_cache)
+    sha, phash = await asyncio.to_thread(diagnosis_cache.keys, data, upload)
+    cached = await asyncio.to_thread(diagnosis_cache.lookup, sha, phash)
+    if cached is not None:
+        return cached
+
+    payload = {
+        "contents": [{
+            "parts": [
+                {"text": input_prompt},
+                {"inline_data": {
+                    "mime_type": mime_type,
+                    "data": base64.b64encode(upload).decode("ascii")
+                }}
+            ]
+        }],
+        "generationConfig": {
+            "temperature": generation_config["temperature"],
+            "topP": generation_config["top_p"],
+            "topK": generation_config["top_k"],
+            "maxOutputTokens": generation_config["max_output_tokens"],
+        },
+        "safetySettings": safety_settings,
+    }
+
+    async with limiters["gemini"].slot_async():
+        response = await get_async_client().post(
+            f"{GEMINI_URL}/{GEMINI_MODEL}:generateContent",
+            params={"key": settings.google_api_key},
+            json=payload
+        )
+    if response.status_code == 429:
+        limiters["gemini"].throttle(retry_after_seconds(response))
+    response.raise_for_status()
+    parts = response.json()["candidates"][0]["content"]["parts"]
+    diagnosis = "".join(part.get("text", "") for part in parts)
+    await asyncio.to_thread(diagnosis_cache.store, sha, phash, diagnosis)
+    return diagnosis
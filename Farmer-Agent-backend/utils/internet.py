@@ -1,8 +1,16 @@
 import requests
+from utils import http_client
 
 def has_internet(url="https://www.google.com", timeout=3):
     try:
-        response = requests.get(url, timeout=timeout)
+        response = http_client.get(url, timeout=timeout, retries=False)
         return True
     except requests.RequestException:
-        return False
\ No newline at end of file
+        return False
+def provider_up(url, timeout=3):
+    """Reachable is not enough for a provider: a 401, 429 or 5xx means calls would fail too."""
+    try:
+        response = http_client.get(url, timeout=timeout, retries=False)
+        return 200 <= response.status_code < 300
+    except requests.RequestException:
+        return False
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Background jobs for long multimodal requests: the client submits, gets a
+# job id straight away and polls for stage progress and the result, so a
+# slow transcription + vision + LLM run no longer has to fit inside one
+# HTTP timeout. At most JOB_QUEUE_SIZE jobs wait for the JOB_WORKERS
+# threads; past that, submit() refuses and the client is told to retry.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))  # seconds a finished job is kept
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE, result_ttl=JOB_RESULT_TTL):
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="farmer-job")
+        self._jobs = {}
+        self._by_key = {}
+        self._queued = 0
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.deduplicated = 0
+
+    def submit(self, fn, *args, idempotency_key=None, **kwargs):
+        """
+        Queue fn(*args, progress=callback, **kwargs); returns (job snapshot, created).
+        A repeated idempotency_key returns the existing job instead of running again.
+        """
+        with self._lock:
+            self._purge_expired()
+            if idempotency_key and idempotency_key in self._by_key:
+                self.deduplicated += 1
+                return self._snapshot(self._jobs[self._by_key[idempotency_key]]), False
+            if self._queued >= self.queue_size:
+                self.rejected += 1
+                raise QueueFull(f"{self._queued} jobs already waiting")
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": "queued",
+                "stage": "queued",
+                "stages": [],
+                "result": None,
+                "error": None,
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "idempotency_key": idempotency_key,
+            }
+            self._jobs[job["job_id"]] = job
+            if idempotency_key:
+                self._by_key[idempotency_key] = job["job_id"]
+            self._queued += 1
+            self.submitted += 1
+            snapshot = self._snapshot(job)
+
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return snapshot, True
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            job["status"] = "running"
+            job["started_at"] = time.time()
+
+        def progress(stage):
+            with self._lock:
+                job["stage"] = stage
+                job["stages"].append({"stage": stage, "at_ms": round((time.time() - job["started_at"]) * 1000, 1)})
+
+        try:
+            result = fn(*args, progress=progress, **kwargs)
+            with self._lock:
+                job["status"] = "done"
+                job["stage"] = "done"
+                job["result"] = result
+        except Exception as e:
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                # a failed job shouldn't pin its key: let the client retry
+                self._forget_key(job)
+        finally:
+            with self._lock:
+                job["finished_at"] = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and job["finished_at"] < cutoff
+        ]
+        for job_id in expired:
+            self._forget_key(self._jobs.pop(job_id))
+
+    def _forget_key(self, job):
+        key = job["idempotency_key"]
+        if key and self._by_key.get(key) == job["job_id"]:
+            del self._by_key[key]
+
+    def _snapshot(self, job):
+        snapshot = {key: value for key, value in job.items() if key != "idempotency_key"}
+        snapshot["stages"] = list(job["stages"])
+        if job["status"] == "queued":
+            snapshot["queue_position"] = sum(
+                1 for other in self._jobs.values()
+                if other["status"] == "queued" and other["created_at"] <= job["created_at"]
+            )
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+            return {
+                "queued": self._queued,
+                "queue_size": self.queue_size,
+                "jobs": statuses,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "deduplicated": self.deduplicated,
+            }
+
+
+job_queue = JobQueue()
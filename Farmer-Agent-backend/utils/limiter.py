@@ -0,0 +1,241 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from utils import metrics, profiling
+
+# Admission control in front of every upstream provider. Each provider gets
+# a cap on calls in flight, a token bucket for its request rate and a
+# bounded wait queue with a deadline, so a burst of farmer requests is
+# smoothed into the provider's quota instead of coming back as 429s.
+# A call that can't get a slot in time raises LimiterRejected, which the
+# callers turn into their usual error / fallback path.
+#
+# Per provider, e.g. for OpenRouter:
+#   LIMIT_OPENROUTER_CONCURRENCY  calls in flight
+#   LIMIT_OPENROUTER_RPS          requests per second (0 = no rate limit)
+#   LIMIT_OPENROUTER_BURST        token bucket size
+#   LIMIT_OPENROUTER_QUEUE        callers allowed to wait for a slot
+#   LIMIT_OPENROUTER_WAIT         seconds a caller waits before giving up
+
+DEFAULT_LIMITS = {
+    # provider: (concurrency, rps, burst, queue, wait seconds)
+    "openrouter": (16, 5, 10, 64, 10),
+    "ollama": (2, 0, 0, 32, 30),  # local model: one or two generations at a time
+    "gemini": (8, 4, 8, 64, 15),
+    "assemblyai": (8, 5, 10, 64, 15),
+    "openweather": (16, 1, 10, 128, 5),  # free tier: 60 calls/minute
+}
+
+ASYNC_POLL_SECONDS = 0.01
+
+
+class LimiterRejected(Exception):
+    pass
+
+
+class ProviderLimiter:
+    def __init__(self, name, concurrency, rps=0, burst=0, max_queue=64, max_wait=10):
+        self.name = name
+        self.concurrency = concurrency
+        self.rps = rps
+        self.burst = max(burst, 1) if rps else 0
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.throttled = 0
+        self.wait_ms_total = 0.0
+        self.max_waiting = 0
+
+    def _try_admit(self, now):
+        """Take a slot if one is free; otherwise return how long to wait (seconds). Lock held."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= self.concurrency:
+            return None  # woken by release()
+        if self.rps:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rps)
+            self._refilled_at = now
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rps
+            self._tokens -= 1
+        self._in_flight += 1
+        return 0
+
+    def _enter_queue(self):
+        if self._waiting >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise LimiterRejected(f"{self.name}: {self._waiting} calls already waiting")
+        self._waiting += 1
+        self.max_waiting = max(self.max_waiting, self._waiting)
+
+    def _admitted(self, started):
+        self.admitted += 1
+        self.wait_ms_total += (time.monotonic() - started) * 1000
+
+    def _timed_out(self):
+        self.rejected_timeout += 1
+        return LimiterRejected(f"{self.name}: no slot within {self.max_wait}s")
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self._cond:
+            wait = self._try_admit(started)
+            if wait == 0:
+                self._admitted(started)
+                return
+            self._enter_queue()
+            try:
+                while True:
+                    now = time.monotonic()
+                    if now >= deadline:
+                        raise self._timed_out()
+                    # None: all slots busy, release() wakes us; else sleep until a token refills
+                    self._cond.wait(deadline - now if wait is None else min(wait, deadline - now))
+                    wait = self._try_admit(time.monotonic())
+                    if wait == 0:
+                        self._admitted(started)
+                        return
+            finally:
+                self._waiting -= 1
+
+    async def acquire_async(self):
+        # Same state as the sync path, but waiting is done with short sleeps
+        # so the event loop is never blocked on the condition variable.
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        with self._cond:
+            wait = self._try_admit(started)
+            if wait == 0:
+                self._admitted(started)
+                return
+            self._enter_queue()
+        try:
+            while True:
+                if time.monotonic() >= deadline:
+                    with self._cond:
+                        raise self._timed_out()
+                await asyncio.sleep(ASYNC_POLL_SECONDS if wait is None else min(max(wait, ASYNC_POLL_SECONDS), 1.0))
+                with self._cond:
+                    wait = self._try_admit(time.monotonic())
+                    if wait == 0:
+                        self._admitted(started)
+                        return
+        finally:
+            with self._cond:
+                self._waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def throttle(self, seconds):
+        """The provider answered 429: admit nothing new for a while."""
+        with self._cond:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    @contextmanager
+    def slot(self):
+        with profiling.span(f"upstream:{self.name}") as span:
+            queued = time.perf_counter()
+            self.acquire()
+            start = time.perf_counter()
+            span.set(wait_ms=round((start - queued) * 1000, 2))
+            try:
+                yield
+            except Exception:
+                metrics.upstream_errors.inc(provider=self.name)
+                raise
+            finally:
+                metrics.upstream_seconds.observe(time.perf_counter() - start, provider=self.name)
+                self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        with profiling.span(f"upstream:{self.name}") as span:
+            queued = time.perf_counter()
+            await self.acquire_async()
+            start = time.perf_counter()
+            span.set(wait_ms=round((start - queued) * 1000, 2))
+            try:
+                yield
+            except Exception:
+                metrics.upstream_errors.inc(provider=self.name)
+                raise
+            finally:
+                metrics.upstream_seconds.observe(time.perf_counter() - start, provider=self.name)
+                self.release()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+                "max_waiting": self.max_waiting,
+                "concurrency": self.concurrency,
+                "rps": self.rps,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "throttled_429": self.throttled,
+                "avg_wait_ms": round(self.wait_ms_total / self.admitted, 1) if self.admitted else 0.0,
+            }
+
+
+def _limiter_from_env(name, defaults):
+    prefix = f"LIMIT_{name.upper()}_"
+    concurrency, rps, burst, queue, wait = defaults
+    return ProviderLimiter(
+        name,
+        concurrency=int(os.getenv(prefix + "CONCURRENCY", str(concurrency))),
+        rps=float(os.getenv(prefix + "RPS", str(rps))),
+        burst=int(os.getenv(prefix + "BURST", str(burst))),
+        max_queue=int(os.getenv(prefix + "QUEUE", str(queue))),
+        max_wait=float(os.getenv(prefix + "WAIT", str(wait))),
+    )
+
+
+limiters = {name: _limiter_from_env(name, defaults) for name, defaults in DEFAULT_LIMITS.items()}
+
+
+def retry_after_seconds(response, default=5.0):
+    """Seconds from a 429's Retry-After header (delta-seconds form only)."""
+    try:
+        return float(response.headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
+
+
+def limiter_stats():
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def _collect_limiter_metrics():
+    stats = limiter_stats()
+    def samples(field):
+        return [({"provider": name}, values[field]) for name, values in stats.items()]
+    return [
+        ("upstream_in_flight", "gauge", "Upstream calls currently holding a limiter slot.", samples("in_flight")),
+        ("upstream_queue_depth", "gauge", "Calls waiting for a limiter slot.", samples("waiting")),
+        ("upstream_admitted_total", "counter", "Calls admitted by the limiter.", samples("admitted")),
+        ("upstream_rejected_total", "counter", "Calls refused because the wait queue was full.",
+         samples("rejected_queue_full")),
+        ("upstream_timed_out_total", "counter", "Calls that gave up waiting for a slot.", samples("rejected_timeout")),
+        ("upstream_throttled_total", "counter", "429 responses that paused a provider.", samples("throttled_429")),
+    ]
+
+
+metrics.register_collector(_collect_limiter_metrics)
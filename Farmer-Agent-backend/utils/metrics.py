@@ -0,0 +1,148 @@
+import bisect
+import threading
+
+# In-process metrics in the Prometheus text format, served on /metrics.
+# Observing is a bisect plus a few additions under a lock, so stages can
+# be instrumented on every request; rendering only happens on a scrape.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7)
+TOKEN_BUCKETS = (50, 100, 250, 500, 750, 1000, 1500, 2000, 4000, 8000)
+KNOWN_LANGS = ("en", "ta", "hi", "te", "ml")  # anything else is "other", to keep label cardinality bounded
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(series[0]), series[1], series[2]) for key, series in sorted(self._series.items())]
+        for key, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+_registry = []
+_collectors = []
+
+
+def counter(name, help, labelnames=()):
+    metric = Counter(name, help, labelnames)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, help, labelnames, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """collect() -> [(name, type, help, [(labels dict, value), ...])], called on every scrape."""
+    _collectors.append(collect)
+
+
+# Farmer pipeline
+request_seconds = histogram(
+    "farmer_http_request_seconds", "HTTP request latency by endpoint and status.", ("endpoint", "method", "status"))
+stage_seconds = histogram(
+    "farmer_stage_seconds", "Latency of each /farmer-agent pipeline stage.", ("stage", "lang"))
+stage_errors = counter(
+    "farmer_stage_errors_total", "Pipeline stages that failed or fell back to a default.", ("stage",))
+prompt_tokens = histogram(
+    "farmer_prompt_tokens", "Estimated prompt size sent to the LLM.", ("lang",), TOKEN_BUCKETS)
+payload_bytes = histogram(
+    "farmer_payload_bytes", "Size of uploads and of what is sent upstream.", ("kind",), SIZE_BUCKETS)
+
+# Upstream providers (observed by the limiter slot around each call)
+upstream_seconds = histogram(
+    "upstream_call_seconds", "Time spent in upstream provider calls.", ("provider",))
+upstream_errors = counter(
+    "upstream_call_errors_total", "Upstream provider calls that raised.", ("provider",))
+
+
+def lang_label(lang):
+    return lang if lang in KNOWN_LANGS else "other"
+
+
+def observe_timings(timings_ms, lang):
+    """Record a request's timings_ms dict (as returned to the client) per stage."""
+    lang = lang_label(lang)
+    for stage, ms in timings_ms.items():
+        stage_seconds.observe(ms / 1000, stage=stage, lang=lang)
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, kind, help, samples in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_number(value)}")
+    return "\n".join(lines) + "\n"
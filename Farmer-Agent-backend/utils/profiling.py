@@ -0,0 +1,270 @@
+import contextvars
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Opt-in profiling of single /farmer-agent requests. A request is profiled
+# when it carries PROFILE_HEADER set to PROFILE_TOKEN or is picked at
+# PROFILE_SAMPLE_RATE. A profiled request records a wall-clock span tree
+# (stages, upstream calls) and a cProfile CPU profile of the request thread
+# and the stage threads it fans out to; both are written to PROFILE_DIR and
+# served at /profiles/<id> to callers sending the same header.
+#
+# Profiles expose internals and cost CPU, so with no PROFILE_TOKEN configured
+# the header is ignored and /profiles is closed; sampling still works.
+#
+# Unprofiled requests pay one header lookup and one random() per request,
+# and span() returns a shared no-op object when nothing is being recorded.
+
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "cache/profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))  # newest profiles kept on disk
+PROFILE_TOP_FUNCTIONS = 25
+
+_session = contextvars.ContextVar("profile_session", default=None)
+_current_span = contextvars.ContextVar("profile_span", default=None)
+_save_lock = threading.Lock()
+
+
+class Span:
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+        self.children = []
+        self._token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is not None:
+            parent.children.append(self)
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        _current_span.reset(self._token)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin):
+        end = self.end if self.end is not None else time.perf_counter()
+        return {
+            "name": self.name,
+            "thread": self.thread,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round((end - self.start) * 1000, 2),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+class _NoSpan:
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NO_SPAN = _NoSpan()
+
+
+class ProfileSession:
+    def __init__(self, endpoint, reason, cpu=True):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.endpoint = endpoint
+        self.reason = reason
+        self.cpu = cpu
+        self.created_at = time.time()
+        self.root = Span(endpoint)
+        self._profilers = []
+        self._lock = threading.Lock()
+
+    def start_cpu(self):
+        """A cProfile profiler for the calling thread (cProfile only sees its own thread)."""
+        if not self.cpu:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Python 3.12+: another profiler already holds the hook
+            return None
+        with self._lock:
+            self._profilers.append(profiler)
+        return profiler
+
+    def cpu_stats(self):
+        stats = None
+        with self._lock:
+            profilers = list(self._profilers)
+        for profiler in profilers:
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+        return stats
+
+    def save(self):
+        stats = self.cpu_stats()
+        top = ""
+        if stats is not None:
+            buffer = io.StringIO()
+            stats.stream = buffer
+            stats.sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            top = buffer.getvalue()
+
+        report = {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "reason": self.reason,
+            "created_at": self.created_at,
+            "wall_ms": round((self.root.end - self.root.start) * 1000, 2),
+            "spans": self.root.to_dict(self.root.start),
+            "cpu_profile": f"/profiles/{self.id}.prof" if stats is not None else None,
+            "cpu_top": top,
+        }
+        with _save_lock:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            if stats is not None:
+                stats.dump_stats(os.path.join(PROFILE_DIR, f"{self.id}.prof"))
+            with open(os.path.join(PROFILE_DIR, f"{self.id}.json"), "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=1)
+            _prune()
+        return report
+
+
+def authorized(headers):
+    """True if headers carry PROFILE_HEADER with the configured PROFILE_TOKEN (never when no token is set)."""
+    value = headers.get(PROFILE_HEADER)
+    return bool(PROFILE_TOKEN and value and hmac.compare_digest(value, PROFILE_TOKEN))
+
+
+def should_profile(headers):
+    """'header', 'sampled' or None for an incoming request."""
+    if authorized(headers):
+        return "header"
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+@contextmanager
+def profile_request(headers, endpoint, cpu=True):
+    """
+    with profile_request(request.headers, "/farmer-agent") as session: ...
+    session is None for unprofiled requests. cpu=False records spans only
+    (the async app shares one thread between requests, so a cProfile there
+    would mix everyone's work together).
+    """
+    reason = should_profile(headers)
+    if reason is None:
+        yield None
+        return
+
+    session = ProfileSession(endpoint, reason, cpu)
+    session_token = _session.set(session)
+    span_token = _current_span.set(session.root)
+    profiler = session.start_cpu()
+    try:
+        yield session
+    except Exception as e:
+        session.root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        session.root.end = time.perf_counter()
+        _current_span.reset(span_token)
+        _session.reset(session_token)
+        try:
+            report = session.save()
+            print(f"🔬 Profiled {endpoint} ({reason}): {report['wall_ms']} ms -> {PROFILE_DIR}/{session.id}.json")
+        except Exception as e:
+            print(f"⚠️ Could not save profile {session.id}: {e}")
+
+
+def span(name, **attrs):
+    """A child span of the current one, or a no-op when this request isn't profiled."""
+    if _session.get() is None:
+        return NO_SPAN
+    return Span(name, attrs)
+
+
+def bind(fn, name):
+    """
+    fn for a worker thread: runs under a span called name, with its own CPU
+    profiler, inside the submitting request's profile. fn itself when the
+    request isn't profiled.
+    """
+    session = _session.get()
+    if session is None:
+        return fn
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        def profiled():
+            profiler = session.start_cpu()
+            try:
+                with Span(name):
+                    return fn(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        return context.run(profiled)
+
+    return run
+
+
+def _prune():
+    reports = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for name in reports[:max(0, len(reports) - PROFILE_KEEP)]:
+        for extension in (".json", ".prof"):
+            path = os.path.join(PROFILE_DIR, name[:-len(".json")] + extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def profile_path(profile_id, extension):
+    """Path of a stored profile file, or None (ids are checked so nothing outside PROFILE_DIR is served)."""
+    if not profile_id.replace("-", "").isalnum():
+        return None
+    path = os.path.abspath(os.path.join(PROFILE_DIR, f"{profile_id}{extension}"))
+    return path if os.path.exists(path) else None
+
+
+def list_profiles():
+    """Newest first: id, endpoint, reason, wall time."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            continue
+        profiles.append({key: report.get(key) for key in ("id", "endpoint", "reason", "created_at", "wall_ms",
+                                                          "cpu_profile")})
+    return profiles
@@ -1,95 +1,149 @@
+import math
+import os
+import re
+import unicodedata
+
+# Per-language prompt templates live in prompts/<lang>.txt and are read once
+# at import. Farmer inputs (typed text, audio transcript, Gemini's image
+# description) are fitted into PROMPT_TOKEN_BUDGET so a long transcript or
+# a 4k-token diagnosis can't balloon LLM latency and cost.
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+DEFAULT_PROMPT_LANG = "ta"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+MIN_PART_TOKENS = 24  # below this a trimmed input stops being useful
+
+NO_WEATHER = {"temp": "NA", "humidity": "NA", "condition": "NA"}
+PART_ICONS = {"text": "📝", "audio": "🎤", "image": "🖼️"}
+
+
+def load_templates(directory=PROMPTS_DIR):
+    templates = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".txt"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                templates[name[:-4]] = f.read()
+    return templates
+
+
+PROMPT_TEMPLATES = load_templates()
+
+
+def char_tokens(ch):
+    if ch.isspace():
+        return 0.1
+    if ch.isascii():
+        return 0.25
+    # Devanagari, Bengali, Gurmukhi, Gujarati, Oriya, Tamil, Telugu, Kannada, Malayalam
+    if "\u0900" <= ch <= "\u0d7f":
+        return 0.5 if unicodedata.category(ch) in ("Mn", "Mc") else 1.0
+    return 1.0  # emoji and other symbols
+
+
+def estimate_tokens(text):
+    """
+    Rough BPE token count without a tokenizer. English averages ~4 characters
+    per token, but Indic scripts get split into roughly one token per letter
+    and half a token per vowel sign/virama, so counting characters the English
+    way under-estimates a Tamil prompt several times over.
+    """
+    return math.ceil(sum(char_tokens(ch) for ch in text or ""))
+
+
+# Template tokens don't change per request; count them once.
+TEMPLATE_TOKENS = {
+    lang: estimate_tokens(template.format(input_summary="", temp="", condition="", humidity=""))
+    for lang, template in PROMPT_TEMPLATES.items()
+}
+
+SENTENCE_END = re.compile(r"(?<=[.!?।\n])\s+")
+
+
+def trim_to_tokens(text, max_tokens):
+    """Keep whole leading sentences that fit in max_tokens; cut mid-sentence only if the first is too long."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    kept, used = [], 0
+    for sentence in SENTENCE_END.split(text):
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept) + " …"
+    # first sentence alone is over budget: cut it character by character
+    used = 0.0
+    for end, ch in enumerate(text):
+        used += char_tokens(ch)
+        if used > max_tokens - 1:
+            return text[:end].rstrip() + "…"
+    return text
+
+
+def fit_parts(parts, budget):
+    """
+    Share budget between the inputs: small ones are kept whole and whatever
+    they leave over is split evenly between the larger ones, which are
+    trimmed to their share. Returns ({name: text}, [names trimmed]).
+    """
+    sizes = {name: estimate_tokens(text) for name, text in parts.items()}
+    remaining = max(budget, MIN_PART_TOKENS * len(parts))
+    allowed = {}
+    for i, name in enumerate(sorted(parts, key=sizes.get)):
+        share = remaining // (len(parts) - i)
+        allowed[name] = min(sizes[name], max(share, MIN_PART_TOKENS))
+        remaining -= allowed[name]
+
+    fitted, trimmed = {}, []
+    for name, text in parts.items():
+        if sizes[name] > allowed[name]:
+            fitted[name] = trim_to_tokens(text, allowed[name])
+            trimmed.append(name)
+        else:
+            fitted[name] = text
+    return fitted, trimmed
+
+
+def collect_parts(text=None, audio_text="", image_desc=""):
+    parts = {"text": text, "audio": audio_text, "image": image_desc}
+    return {name: value.strip() for name, value in parts.items() if value and value.strip()}
+
+
+def format_parts(parts):
+    return "\n".join(f"{PART_ICONS[name]} {value}" for name, value in parts.items()) or "[No input]"
+
+
+def summarize_inputs(text=None, audio_text="", image_desc=""):
+    """The farmer-supplied part of the prompt, without the language template."""
+    return format_parts(collect_parts(text, audio_text, image_desc))
+
+
+def assemble_prompt(text=None, audio_text="", image_desc="", weather=None, lang="ta", budget=PROMPT_TOKEN_BUDGET):
+    """Build the prompt within budget tokens; returns (prompt, stats)."""
+    weather = weather or NO_WEATHER
+    if lang not in PROMPT_TEMPLATES:
+        lang = DEFAULT_PROMPT_LANG
+    template = PROMPT_TEMPLATES[lang]
+    weather_fields = {key: weather[key] for key in ("temp", "condition", "humidity")}
+
+    parts = collect_parts(text, audio_text, image_desc)
+    overhead = TEMPLATE_TOKENS[lang] + estimate_tokens("".join(str(v) for v in weather_fields.values()))
+    input_budget = budget - overhead - 2 * len(parts)  # icon + newline per part
+    input_tokens = sum(estimate_tokens(value) for value in parts.values())
+
+    trimmed = []
+    if input_tokens > input_budget:
+        parts, trimmed = fit_parts(parts, input_budget)
+
+    prompt = template.format(input_summary=format_parts(parts), **weather_fields)
+    return prompt, {
+        "prompt_tokens": estimate_tokens(prompt),
+        "input_tokens": input_tokens,
+        "budget": budget,
+        "trimmed": trimmed,
+    }
+
+
 def build_prompt(text=None, audio_text="", image_desc="", weather=None, lang="ta"):
-    text = text or ""
-    audio_text = audio_text or ""
-    image_desc = image_desc or ""
-    weather = weather or {"temp": "NA", "humidity": "NA", "condition": "NA"}
-
-    parts = []
-
-    if text.strip():
-        parts.append(f"📝 {text.strip()}")
-
-    if audio_text.strip():
-        parts.append(f"🎤 {audio_text.strip()}")
-
-    if image_desc.strip():
-        parts.append(f"🖼️ {image_desc.strip()}")
-
-    input_summary = "\n".join(parts) or "[No input]"
-
-    if lang == "hi":
-        return f"""आप एक बुद्धिमान बहुभाषी कृषि सहायक AI हैं। किसान की जानकारी और मौसम के अनुसार हिंदी में सलाह दें।
-
-{input_summary}
-
-🌦️ मौसम की जानकारी:
-- तापमान: {weather['temp']}°C
-- स्थिति: {weather['condition']}
-- नमी: {weather['humidity']}%
-
-✅ कृपया:
-1. हिंदी में सरल उत्तर दें।
-2. वर्तमान मौसम के अनुसार कौन सी फसल बोनी चाहिए बताएं।
-3. यदि ज़मीन या फसल में कोई समस्या हो तो सुझाव दें।
-"""
-    elif lang == "en":
-        return f"""You are a smart multilingual agricultural assistant AI. Based on the farmer's input and weather, reply in clear and simple English.
-
-{input_summary}
-
-🌦️ Current Weather:
-- Temperature: {weather['temp']}°C
-- Condition: {weather['condition']}
-- Humidity: {weather['humidity']}%
-
-✅ Please:
-1. Respond in English simply.
-2. Suggest what crop can be planted now.
-3. Give advice if there is any field or crop issue.
-"""
-    elif lang == "te":
-        return f"""మీరు తెలుగులో సమాధానాలు ఇచ్చే తెలివైన బహుభాషా వ్యవసాయ సహాయక AI. రైతు ఇచ్చిన సమాచారం మరియు వాతావరణాన్ని బట్టి తెలుగులో సలహా ఇవ్వండి.
-
-{input_summary}
-
-🌦️ వాతావరణ సమాచారం:
-- ఉష్ణోగ్రత: {weather['temp']}°C
-- పరిస్థితి: {weather['condition']}
-- ఆర్ద్రత: {weather['humidity']}%
-
-✅ దయచేసి:
-1. సరళమైన తెలుగులో సమాధానం ఇవ్వండి.
-2. ఇప్పుడు ఏ పంట వేయాలో సూచించండి.
-3. భూమి లేదా పంట సమస్యలు ఉంటే సలహా ఇవ్వండి.
-"""
-    elif lang == "ml":
-        return f"""നിങ്ങൾ മലയാളത്തിൽ ഉത്തരം നൽകുന്ന ബഹുഭാഷാ കാർഷിക സഹായ AI ആണു. കർഷകന്റെ വിവരങ്ങളും കാലാവസ്ഥയും അടിസ്ഥാനമാക്കി മലയാളത്തിൽ ഉപദേശം നൽകുക.
-
-{input_summary}
-
-🌦️ കാലാവസ്ഥാ വിവരങ്ങൾ:
-- താപനില: {weather['temp']}°C
-- അവസ്ഥ: {weather['condition']}
-- ഈർപ്പം: {weather['humidity']}%
-
-✅ ദയവായി:
-1. ലളിതമായ മലയാളത്തിൽ മറുപടി നൽകുക.
-2. ഇപ്പോൾ എത് വിളം വളർത്താമെന്നു നിർദേശിക്കുക.
-3. മണ്ണോ വിളയിലോ പ്രശ്നങ്ങൾ ഉണ്ടെങ്കിൽ ഉപദേശം നൽകുക.
-"""
-    else:
-        return f"""நீங்கள் ஒரு அறிவுள்ள பன்மொழி விவசாய ஆலோசகர் AI. 
-விவசாயியின் உள்ளீடுகள் மற்றும் வானிலை அடிப்படையில் தமிழில் ஆலோசனை வழங்கவும்.
-
-{input_summary}
-
-🌦️ தற்போதைய வானிலை:
-- வெப்பநிலை: {weather['temp']}°C
-- நிலை: {weather['condition']}
-- ஈரப்பதம்: {weather['humidity']}%
-
-✅ உங்கள் பதிலில்:
-1. தமிழில் எளிமையாக விளக்கவும்.
-2. தற்போது என்ன விதைக்கலாம் என்பதைச் சொல்லவும்.
-3. நிலம் அல்லது பயிர் தொடர்பான சிக்கல்கள் இருந்தால் பரிந்துரை செய்யவும்.
-"""
+    return assemble_prompt(text, audio_text, image_desc, weather, lang)[0]
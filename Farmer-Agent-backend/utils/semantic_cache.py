@@ -0,0 +1,141 @@
+import hashlib
+import math
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Near-duplicate farmer questions ("leaf curl in chilli", "chilli leaves
+# curling") get the same advice, so answers are reused when a new question
+# is close enough to an earlier one in the same language and weather band.
+#
+# Embeddings are local and dependency-free: hashed character n-grams, which
+# work the same for Tamil/Hindi/Telugu/Malayalam scripts as for English.
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+
+EMBED_DIM = 1 << 18
+NGRAM_SIZES = (2, 3, 4)
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFC", text or "").lower()
+    # Drop punctuation/emoji but keep letters, digits and combining marks
+    # (Indic vowel signs are category M and carry meaning).
+    kept = [ch if unicodedata.category(ch)[0] in "LMN" else " " for ch in text]
+    return " ".join("".join(kept).split())
+
+
+def embed(text):
+    """Sparse, L2-normalised hashed character n-gram vector: {bucket: weight}."""
+    text = f" {_normalize(text)} "
+    vector = {}
+    for n in NGRAM_SIZES:
+        for i in range(len(text) - n + 1):
+            digest = hashlib.blake2b(text[i:i + n].encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest, "little") % EMBED_DIM
+            vector[bucket] = vector.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in vector.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def weather_bucket(weather):
+    """Coarse weather band so advice for 24°C drizzle isn't reused for 38°C sun."""
+    weather = weather or {}
+    try:
+        temp = f"{int(float(weather.get('temp')) // 5) * 5}C"
+    except (TypeError, ValueError):
+        temp = "NA"
+    try:
+        humidity = f"{int(float(weather.get('humidity')) // 20) * 20}%"
+    except (TypeError, ValueError):
+        humidity = "NA"
+    condition = str(weather.get("condition", "NA")).lower()
+    return f"{temp}|{humidity}|{condition}"
+
+
+class SemanticCache:
+    """LRU-bounded nearest-neighbour answer cache, partitioned by (lang, weather bucket)."""
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_SIZE,
+                 ttl=SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # entry id -> (partition, vector, answer, stored_at)
+        self._partitions = {}           # partition -> set of entry ids
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remove(self, entry_id):
+        partition = self._entries.pop(entry_id)[0]
+        ids = self._partitions[partition]
+        ids.discard(entry_id)
+        if not ids:
+            del self._partitions[partition]
+
+    def lookup(self, query, lang, weather=None):
+        """Return the closest cached answer above the threshold, or None."""
+        vector = embed(query)
+        partition = (lang, weather_bucket(weather))
+        now = time.time()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._partitions.get(partition, ())):
+                _, cached_vector, _, stored_at = self._entries[entry_id]
+                if now - stored_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                score = cosine(vector, cached_vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2]
+
+    def store(self, query, lang, weather, answer):
+        vector = embed(query)
+        if not vector:
+            return
+        partition = (lang, weather_bucket(weather))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (partition, vector, answer, time.time())
+            self._partitions.setdefault(partition, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "partitions": len(self._partitions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+response_cache = SemanticCache()
@@ -0,0 +1,34 @@
+import os
+from dotenv import load_dotenv
+
+# .env is read once, here, before any other module looks at os.environ.
+# app.py / asgi_app.py import this first so every env-var tunable in utils
+# sees the values from .env.
+load_dotenv()
+
+DEFAULT_GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+
+class Settings:
+    """API keys and upstream endpoints, read once at startup."""
+
+    def __init__(self):
+        self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+        self.google_api_key = os.getenv("GOOGLE_API_KEY")
+        self.assemblyai_key = os.getenv("ASSEMBLYAI_KEY")
+        self.openweather_key = os.getenv("OPENWEATHER_KEY")
+
+        # Base URLs can be pointed at a proxy, a mirror or a local fake
+        self.openrouter_base_url = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1").rstrip("/")
+        self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
+        self.ollama_model = os.getenv("OLLAMA_MODEL", "gemma:3b")
+        self.gemini_base_url = os.getenv("GEMINI_BASE_URL", DEFAULT_GEMINI_BASE_URL).rstrip("/")
+        self.gemini_model = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+        self.assemblyai_base_url = os.getenv("ASSEMBLYAI_BASE_URL", "https://api.assemblyai.com").rstrip("/")
+        self.openweather_base_url = os.getenv(
+            "OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5"
+        ).rstrip("/")
+        self.internet_probe_url = os.getenv("INTERNET_PROBE_URL", "https://www.google.com")
+
+
+settings = Settings()
@@ -1,22 +1,80 @@
 import os
-import requests
-from dotenv import load_dotenv
+from utils import http_client
+from utils.async_http import get_async_client
+from utils.cache_utils import TTLCache, SQLiteStore
+from utils.limiter import limiters, retry_after_seconds
+from utils import metrics
+from utils.settings import settings
 
-# Load API key from .env
-load_dotenv()
-API_KEY = os.getenv("OPENWEATHER_KEY")
+API_KEY = settings.openweather_key
+WEATHER_URL = f"{settings.openweather_base_url}/weather"
+
+# OpenWeather only refreshes every ~10 minutes, so farmers in the same
+# district can share one lookup. Stale entries are served while a single
+# background refresh runs. Set WEATHER_CACHE_DB to share across workers.
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_STALE_TTL = int(os.getenv("WEATHER_STALE_TTL", "1800"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "2048"))
+WEATHER_CACHE_DB = os.getenv("WEATHER_CACHE_DB", "")
+
+weather_cache = TTLCache(
+    ttl=WEATHER_CACHE_TTL,
+    stale_ttl=WEATHER_STALE_TTL,
+    max_entries=WEATHER_CACHE_SIZE,
+    store=SQLiteStore(WEATHER_CACHE_DB, table="weather") if WEATHER_CACHE_DB else None,
+)
+
+NO_WEATHER = {"temp": "NA", "humidity": "NA", "condition": "NA"}
+
+def normalize_city(city):
+    """'  Salem , ' / 'SALEM' / 'salem.' all map to the same cache key."""
+    return " ".join((city or "").lower().split()).strip(" ,.")
+
+def parse_weather(data):
+    return {
+        "temp": data["main"]["temp"],
+        "humidity": data["main"]["humidity"],
+        "condition": data["weather"][0]["description"]
+    }
+
+def fetch_weather(city):
+    # params, not an f-string: city names with spaces, '&' or non-ASCII text must be URL-encoded
+    params = {"q": city, "appid": API_KEY, "units": "metric"}
+    with limiters["openweather"].slot():
+        response = http_client.get(WEATHER_URL, params=params)
+    if response.status_code == 429:
+        limiters["openweather"].throttle(retry_after_seconds(response))
+    response.raise_for_status()  # raises exception for HTTP errors
+    return parse_weather(response.json())
+
+async def fetch_weather_async(city):
+    params = {"q": city, "appid": API_KEY, "units": "metric"}
+    async with limiters["openweather"].slot_async():
+        response = await get_async_client().get(WEATHER_URL, params=params)
+    if response.status_code == 429:
+        limiters["openweather"].throttle(retry_after_seconds(response))
+    response.raise_for_status()
+    return parse_weather(response.json())
 
 def get_weather(city):
+    key = normalize_city(city)
+    if not key:
+        return dict(NO_WEATHER)
+    try:
+        # Failures raise inside the loader, so they are never cached.
+        return weather_cache.get_or_load(key, lambda: fetch_weather(key))
+    except Exception as e:
+        metrics.stage_errors.inc(stage="weather")
+        print(f"Weather API error: {e}")
+        return dict(NO_WEATHER)
+
+async def get_weather_async(city):
+    key = normalize_city(city)
+    if not key:
+        return dict(NO_WEATHER)
     try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={API_KEY}&units=metric"
-        response = requests.get(url)
-        response.raise_for_status()  # raises exception for HTTP errors
-        data = response.json()
-        return {
-            "temp": data["main"]["temp"],
-            "humidity": data["main"]["humidity"],
-            "condition": data["weather"][0]["description"]
-        }
+        return await weather_cache.get_or_load_async(key, lambda: fetch_weather_async(key))
     except Exception as e:
+        metrics.stage_errors.inc(stage="weather")
         print(f"Weather API error: {e}")
-        return {"temp": "NA", "humidity": "NA", "condition": "NA"}
\ No newline at end of file
+        return dict(NO_WEATHER)
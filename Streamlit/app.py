@@ -1,13 +1,20 @@
 import streamlit as st
 import requests
 import os
+import json
+import time
+import hashlib
 import tempfile
 from audio_recorder_streamlit import audio_recorder
-from gtts import gTTS
-from deep_translator import GoogleTranslator
+from tts import speak_chunks
+from ui_catalog import get_translations
 
 # ---------- CONFIG ----------
 BACKEND_URL = "http://127.0.0.1:5000/farmer-agent"
+STREAM_URL = f"{BACKEND_URL}/stream"
+JOBS_URL = f"{BACKEND_URL}/jobs"
+JOB_POLL_SECONDS = 1.0
+JOB_MAX_WAIT = 600  # seconds; a job keeps running server-side even if we give up
 LANGUAGES = {
     "English": "en",
     "Tamil (தமிழ்)": "ta",
@@ -22,38 +29,10 @@ st.set_page_config(page_title="Agri Saarthi", layout="centered")
 selected_lang = st.selectbox("🌐 Choose Language", list(LANGUAGES.keys()))
 lang_code = LANGUAGES[selected_lang]
 
-# ---------- Translation System (Fast, Cache + Clean) ----------
-UI_STRINGS = [
-    "Your AI Farming Assistant",
-    "🎤 Record your voice question",
-    "🎙️ Click to record your question",
-    "Processing your voice...",
-    "Your voice has been recorded successfully!",
-    "📝 Or type your question below (optional)",
-    "Type here...",
-    "📸 Upload crop image (optional)",
-    "Choose an image file",
-    "🏙️ Enter your city or village name",
-    "e.g., Salem",
-    "🌾 Ask Agri Saarthi",
-    "Please provide at least one input to get advice.",
-    "🔍 Getting advice... Please wait",
-    "🤖 AI Advice",
-    "Spoken in",
-    "Could not generate voice reply.",
-    "Error while processing your request:",
-    "Could not save audio:"
-]
-
+# ---------- Translation System (on-disk catalog, see ui_catalog.py) ----------
 @st.cache_resource
 def get_translation_map(lang_code):
-    if lang_code == "en":
-        return {text: text for text in UI_STRINGS}
-    else:
-        return {
-            text: GoogleTranslator(source='en', target=lang_code).translate(text)
-            for text in UI_STRINGS
-        }
+    return get_translations(lang_code)
 
 tmap = get_translation_map(lang_code)
 def t(text): return tmap.get(text, text)
@@ -94,6 +73,60 @@ image_file = st.file_uploader(t("Choose an image file"), type=["jpg", "jpeg"])
 
 city = st.text_input(t("🏙️ Enter your city or village name"), placeholder=t("e.g., Salem"))
 
+# ---------- STREAMING ----------
+def stream_advice(data, files):
+    """Yield answer tokens from the backend's server-sent events as they arrive."""
+    with requests.post(STREAM_URL, data=data, files=files, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines():
+            line = line.decode("utf-8")
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                payload = json.loads(line[len("data:"):])
+                if event == "token":
+                    yield payload["text"]
+
+# ---------- BACKGROUND JOBS ----------
+# Voice and photo questions can take longer than one HTTP timeout, so they
+# are submitted as a job and polled with short requests instead.
+JOB_STAGES = {
+    "queued": "⏳ Waiting for a free slot...",
+    "inputs": "🎧 Reading your voice, photo and weather...",
+    "prompt": "🎧 Reading your voice, photo and weather...",
+    "llm": "🤖 Writing your advice...",
+}
+
+def job_key(data, audio_bytes, image_bytes):
+    """Same inputs -> same key, so a double click or rerun reuses the running job."""
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8"))
+    digest.update(audio_bytes or b"")
+    digest.update(image_bytes or b"")
+    return digest.hexdigest()
+
+def run_job(data, files, key, on_stage):
+    """Submit a job, poll until it finishes, return the /farmer-agent response body."""
+    deadline = time.monotonic() + JOB_MAX_WAIT
+    while True:
+        response = requests.post(JOBS_URL, data=data, files=files, headers={"Idempotency-Key": key}, timeout=30)
+        if response.status_code != 503 or time.monotonic() > deadline:
+            break
+        on_stage("queued")  # server is applying backpressure
+        time.sleep(float(response.headers.get("Retry-After", "5")))
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    while time.monotonic() < deadline:
+        job = requests.get(f"{JOBS_URL}/{job_id}", timeout=10).json()
+        if job.get("status") == "done":
+            return job["result"]
+        if job.get("status") in ("failed", None):  # None: expired or unknown job
+            raise RuntimeError(job.get("error"))
+        on_stage(job["stage"])
+        time.sleep(JOB_POLL_SECONDS)
+    raise TimeoutError(f"job {job_id} still running after {JOB_MAX_WAIT}s")
+
 # ---------- SUBMIT ----------
 if st.button(t("🌾 Ask Agri Saarthi")):
     if not (text_input or image_file or audio_path):
@@ -102,35 +135,42 @@ if st.button(t("🌾 Ask Agri Saarthi")):
         with st.spinner(t("🔍 Getting advice... Please wait")):
             try:
                 data = {"text": text_input, "city": city, "lang": lang_code}
-                files = {}
 
+                # Read uploads once: the same bytes are sent and hashed into the job key
+                audio_data = None
                 if audio_path:
-                    files["audio"] = (os.path.basename(audio_path), open(audio_path, "rb"), "audio/wav")
-                if image_file:
-                    files["image"] = (image_file.name, image_file, "image/jpeg")
+                    with open(audio_path, "rb") as f:
+                        audio_data = f.read()
+                image_data = image_file.getvalue() if image_file else None
 
-                response = requests.post(BACKEND_URL, data=data, files=files, timeout=60)
-                response.raise_for_status()
-
-                result = response.json()
-                ai_response = result.get("ai_response", "")
-
-                st.markdown(f"### 🤖 {t('AI Advice')}")
-                st.write(t(ai_response))
+                files = {}
+                if audio_data is not None:
+                    files["audio"] = (os.path.basename(audio_path), audio_data, "audio/wav")
+                if image_data is not None:
+                    files["image"] = (image_file.name, image_data, "image/jpeg")
+
+                if files:
+                    stage_box = st.empty()
+                    result = run_job(data, files, job_key(data, audio_data, image_data),
+                                     lambda stage: stage_box.info(t(JOB_STAGES.get(stage, JOB_STAGES["llm"]))))
+                    stage_box.empty()
+                    ai_response = result.get("ai_response", "")
+                    st.markdown(f"### 🤖 {t('AI Advice')}")
+                    st.write(ai_response)
+                else:
+                    # Paint the answer token by token instead of waiting for the full reply
+                    st.markdown(f"### 🤖 {t('AI Advice')}")
+                    ai_response = st.write_stream(stream_advice(data, files))
 
                 # ---------- AI TTS Response ----------
                 if ai_response:
                     try:
-                        tts = gTTS(ai_response, lang=lang_code)
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tf:
-                            tts_path = tf.name
-                            tts.save(tts_path)
-
-                        with open(tts_path, "rb") as f:
-                            st.audio(f.read(), format="audio/mp3")
-                            st.caption(f"🔊 {t('Spoken in')} {selected_lang}")
-
-                        os.remove(tts_path)
+                        # One player per sentence chunk, added as each is synthesized:
+                        # the first is playable right away, and no player is ever
+                        # replaced (replacing one would restart what the farmer hears).
+                        for chunk in speak_chunks(ai_response, lang_code):
+                            st.audio(chunk, format="audio/mp3")
+                        st.caption(f"🔊 {t('Spoken in')} {selected_lang}")
 
                     except Exception as e:
                         st.warning(t("Could not generate voice reply.") + f" ({e})")
@@ -0,0 +1,41 @@
+from tts import cache_key, split_sentences
+
+
+def test_short_sentences_are_merged():
+    assert split_sentences("Spray neem oil. Use sticky traps! Water less?") == [
+        "Spray neem oil. Use sticky traps! Water less?"
+    ]
+
+
+def test_chunks_stay_under_max_chars():
+    text = " ".join(f"Sentence number {i} about chilli." for i in range(20))
+    chunks = split_sentences(text, max_chars=80)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_long_sentence_is_its_own_chunk():
+    long = "word " * 60
+    chunks = split_sentences(f"Short one. {long.strip()}. Another.", max_chars=50)
+    assert chunks[0] == "Short one."
+    assert chunks[1] == long.strip() + "."
+    assert chunks[2] == "Another."
+
+
+def test_devanagari_danda_and_newlines_end_sentences():
+    text = "पत्ते मुड़ रहे हैं। नीम का तेल छिड़कें।\nशाम को छिड़काव करें।"
+    assert split_sentences(text, max_chars=25) == [
+        "पत्ते मुड़ रहे हैं।",
+        "नीम का तेल छिड़कें।",
+        "शाम को छिड़काव करें।",
+    ]
+
+
+def test_blank_text_has_no_chunks():
+    assert split_sentences("   \n ") == []
+
+
+def test_cache_key_depends_on_language():
+    assert cache_key("Namaste", "hi") != cache_key("Namaste", "en")
+    assert cache_key("Namaste", "hi") == cache_key("Namaste", "hi")
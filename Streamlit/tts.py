@@ -0,0 +1,79 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from gtts import gTTS
+
+# Spoken replies: the answer is split into sentence chunks that gTTS
+# synthesizes in parallel, all in memory (no temp MP3 files). Chunks are
+# cached by hash of (lang, text), so a repeated answer - or a repeated
+# sentence in a new one - is spoken without another round trip to Google.
+
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "200"))
+TTS_CACHE_SIZE = int(os.getenv("TTS_CACHE_SIZE", "500"))
+
+SENTENCE_END = re.compile(r"(?<=[.!?।\n])\s+")
+
+tts_pool = ThreadPoolExecutor(max_workers=TTS_WORKERS, thread_name_prefix="tts")
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def split_sentences(text, max_chars=TTS_CHUNK_CHARS):
+    """Sentence chunks of up to max_chars (short sentences are merged)."""
+    chunks, current = [], ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def cache_key(text, lang):
+    return hashlib.sha256(f"{lang}\n{text}".encode("utf-8")).hexdigest()
+
+
+def _cache_get(key):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    return None
+
+
+def _cache_put(key, audio):
+    with _cache_lock:
+        _cache[key] = audio
+        _cache.move_to_end(key)
+        while len(_cache) > TTS_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def synthesize_chunk(text, lang):
+    key = cache_key(text, lang)
+    audio = _cache_get(key)
+    if audio is None:
+        buffer = io.BytesIO()
+        gTTS(text, lang=lang).write_to_fp(buffer)
+        audio = buffer.getvalue()
+        _cache_put(key, audio)
+    return audio
+
+
+def speak_chunks(text, lang):
+    """Yield MP3 bytes chunk by chunk, in order; later chunks are synthesized while earlier ones play."""
+    futures = [tts_pool.submit(synthesize_chunk, chunk, lang) for chunk in split_sentences(text)]
+    for future in futures:
+        yield future.result()
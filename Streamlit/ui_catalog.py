@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+
+# Translations of the UI strings, kept on disk as one JSON catalog per
+# language (translations/<lang>.json) keyed by a hash of the English text.
+# A page render only reads the catalog; strings missing from it (new or
+# edited since the catalog was built) are translated in one batched call
+# and written back. With no network the English text is shown instead.
+#
+# Prebuild catalogs for offline use with:
+#     python ui_catalog.py ta hi te ml
+
+CATALOG_DIR = os.getenv("UI_CATALOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "translations"))
+CATALOG_VERSION = 1  # bump to throw away every catalog, e.g. after changing translator
+SEPARATOR = "\n"
+
+UI_STRINGS = [
+    "Your AI Farming Assistant",
+    "🎤 Record your voice question",
+    "🎙️ Click to record your question",
+    "Processing your voice...",
+    "Your voice has been recorded successfully!",
+    "📝 Or type your question below (optional)",
+    "Type here...",
+    "📸 Upload crop image (optional)",
+    "Choose an image file",
+    "🏙️ Enter your city or village name",
+    "e.g., Salem",
+    "🌾 Ask Agri Saarthi",
+    "Please provide at least one input to get advice.",
+    "🔍 Getting advice... Please wait",
+    "🤖 AI Advice",
+    "Spoken in",
+    "Could not generate voice reply.",
+    "Error while processing your request:",
+    "Could not save audio:",
+    "⏳ Waiting for a free slot...",
+    "🎧 Reading your voice, photo and weather...",
+    "🤖 Writing your advice..."
+]
+
+
+def string_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def catalog_path(lang_code):
+    return os.path.join(CATALOG_DIR, f"{lang_code}.json")
+
+
+def load_catalog(lang_code):
+    try:
+        with open(catalog_path(lang_code), encoding="utf-8") as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if catalog.get("version") != CATALOG_VERSION:
+        return {}
+    return catalog.get("strings", {})
+
+
+def save_catalog(lang_code, strings):
+    os.makedirs(CATALOG_DIR, exist_ok=True)
+    path = catalog_path(lang_code)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": CATALOG_VERSION, "lang": lang_code, "strings": strings}, f,
+                  ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)  # readers never see a half-written catalog
+
+
+def translate_batch(texts, lang_code):
+    """All texts in one request (joined by newlines); per-string only if the lines don't come back intact."""
+    from deep_translator import GoogleTranslator
+
+    translator = GoogleTranslator(source='en', target=lang_code)
+    joined = translator.translate(SEPARATOR.join(texts))
+    lines = [line.strip() for line in (joined or "").split(SEPARATOR)]
+    if len(lines) == len(texts) and all(lines):
+        return lines
+    return translator.translate_batch(texts)
+
+
+def get_translations(lang_code, texts=UI_STRINGS):
+    """{english: translated} for texts, from the on-disk catalog where possible."""
+    if lang_code == "en":
+        return {text: text for text in texts}
+
+    strings = load_catalog(lang_code)
+    missing = [text for text in texts if string_key(text) not in strings]
+    if missing:
+        try:
+            for text, translated in zip(missing, translate_batch(missing, lang_code)):
+                strings[string_key(text)] = {"source": text, "text": translated}
+            save_catalog(lang_code, strings)
+        except Exception as e:
+            print(f"⚠️ UI translation to {lang_code} unavailable, showing English: {e}")
+
+    return {
+        text: strings[string_key(text)]["text"] if string_key(text) in strings else text
+        for text in texts
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    for lang_code in sys.argv[1:]:
+        translations = get_translations(lang_code)
+        done = sum(translations[text] != text for text in UI_STRINGS)
+        print(f"✅ {lang_code}: {done}/{len(UI_STRINGS)} strings in {catalog_path(lang_code)}")
@@ -0,0 +1,99 @@
+"""
+Compare the old torch.hub fp32 YOLOv5 path with the int8 ONNX engine on a
+folder of leaf photos.
+
+    python benchmarks/bench_disease_engine.py sample_leaves/ [--runs 3] [--threads 4]
+
+Reports mean/p50/p95 latency per image for both paths and how often they
+agree on the top label.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image  # noqa: E402
+
+from disease_engine import DiseaseEngine, DISEASE_MODEL_PATH  # noqa: E402
+
+EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(name, latencies):
+    print(f"{name:12} mean {statistics.mean(latencies):8.1f} ms   "
+          f"p50 {percentile(latencies, 50):8.1f} ms   p95 {percentile(latencies, 95):8.1f} ms")
+
+
+def torch_detector():
+    import torch
+
+    model = torch.hub.load('ultralytics/yolov5', 'yolov5s')
+
+    # The production path: PIL in, AutoShape does letterboxing and NMS.
+    # (Given a tensor, AutoShape skips both and returns the raw output.)
+    def detect(img):
+        predictions = model(img, size=640).pandas().xyxy[0]
+        return predictions['name'].iloc[0] if len(predictions) > 0 else "Healthy"
+
+    return detect
+
+
+def time_detector(detect, images, runs):
+    latencies, labels = [], []
+    for _ in range(runs):
+        labels = []
+        for img in images:
+            start = time.perf_counter()
+            labels.append(detect(img))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, labels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("image_dir")
+    parser.add_argument("--model", default=DISEASE_MODEL_PATH)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--skip-torch", action="store_true", help="only time the ONNX engine")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.image_dir, name)
+        for name in os.listdir(args.image_dir)
+        if name.lower().endswith(EXTENSIONS)
+    )
+    if not paths:
+        print(f"❌ No images found in {args.image_dir}")
+        return
+    images = [Image.open(path).convert("RGB") for path in paths]
+
+    engine = DiseaseEngine(model_path=args.model, threads=args.threads)
+    engine.detect(images[0])  # warm-up
+    onnx_ms, onnx_labels = time_detector(engine.detect, images, args.runs)
+
+    print(f"{len(images)} images x {args.runs} runs")
+    summarize("onnx int8", onnx_ms)
+
+    if args.skip_torch:
+        return
+    detect = torch_detector()
+    detect(images[0])
+    torch_ms, torch_labels = time_detector(detect, images, args.runs)
+    summarize("torch fp32", torch_ms)
+
+    agree = sum(a == b for a, b in zip(onnx_labels, torch_labels))
+    print(f"speed-up (p50): {percentile(torch_ms, 50) / percentile(onnx_ms, 50):.1f}x")
+    print(f"top-label agreement: {agree}/{len(images)} ({100 * agree / len(images):.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
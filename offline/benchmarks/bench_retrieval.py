@@ -0,0 +1,137 @@
+"""
+Compare vector-only, BM25-only and hybrid retrieval on the offline RAG index.
+
+    python benchmarks/bench_retrieval.py [pdfs ...] [--questions questions.txt] [--runs 3] [--k 4]
+    python benchmarks/bench_retrieval.py --fake-embeddings --embed-latency-ms 150   # no Ollama needed
+
+Builds or reuses the on-disk Chroma + BM25 index for the PDFs (default:
+the same knowledge files as rag.py), then times each retrieval mode over
+the questions and reports mean/p50/p95 latency. It also reports how often
+the top k contains the question's rarest indexed term (a pest or chemical
+name, usually), which is where vector-only retrieval tends to miss, and
+how much the hybrid results overlap each single method.
+
+--fake-embeddings swaps Ollama for deterministic hashed vectors with
+--embed-latency-ms of simulated model time, so the latency comparison runs
+on any machine; its vector rankings are meaningless.
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hybrid_retriever import HybridRetriever, load_or_build_lexical_index, retrieval_stats, tokenize  # noqa: E402
+from vector_index import load_or_build_index, INDEX_DIR  # noqa: E402
+
+MODES = ("vector", "lexical", "hybrid")
+QUESTIONS = [
+    "How do I control stem borer in paddy?",
+    "Which insecticide works against whitefly on cotton?",
+    "Leaf curl virus in chilli, what should I do?",
+    "Dose of imidacloprid for aphids",
+    "Signs of late blight in potato and tomato",
+    "How to manage fall armyworm in maize?",
+    "Yellow mosaic disease in black gram",
+    "Is neem oil useful against mealybugs?",
+    "Brown plant hopper attack after heavy nitrogen",
+    "How to store grain to avoid weevils?",
+]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def slow_fake_embeddings(latency_ms):
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+
+    class SlowFakeEmbeddings(DeterministicFakeEmbedding):
+        def embed_query(self, text):
+            time.sleep(latency_ms / 1000)
+            return super().embed_query(text)
+
+    return SlowFakeEmbeddings(size=768)
+
+
+def rarest_term(question, lexical):
+    """The question's indexed token found in the fewest chunks, or None."""
+    terms = [term for term in tokenize(question) if term in lexical.postings]
+    return min(terms, key=lambda term: len(lexical.postings[term])) if terms else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--questions", help="text file, one question per line")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--embed-model", default="nomic-embed-text")
+    parser.add_argument("--persist-dir", default=INDEX_DIR)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    parser.add_argument("--embed-latency-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or ['farming_threats.pdf'] + sorted(glob.glob('knowledge/*.pdf'))
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = QUESTIONS
+
+    if args.fake_embeddings:
+        embeddings, embed_model = slow_fake_embeddings(args.embed_latency_ms), "fake"
+    else:
+        from langchain_community.embeddings import OllamaEmbeddings
+        embeddings, embed_model = OllamaEmbeddings(model=args.embed_model), args.embed_model
+
+    collection = load_or_build_index(pdfs, embeddings, embed_model, persist_dir=args.persist_dir)
+    lexical = load_or_build_lexical_index(collection, args.persist_dir)
+    if not lexical.ids:
+        print(f"❌ No chunks indexed from {', '.join(pdfs)}")
+        return
+
+    # A generous timeout: this measures each mode, not the BM25 fallback
+    retrievers = {
+        mode: HybridRetriever(collection=collection, embeddings=embeddings, lexical=lexical, mode=mode, k=args.k,
+                              embed_timeout=60)
+        for mode in MODES
+    }
+    latencies = {mode: [] for mode in MODES}
+    results = {mode: [] for mode in MODES}
+    for run in range(args.runs):
+        for question in questions:
+            for mode, retriever in retrievers.items():
+                start = time.perf_counter()
+                docs = retriever.invoke(question)
+                latencies[mode].append((time.perf_counter() - start) * 1000)
+                if run == 0:
+                    results[mode].append([doc.page_content for doc in docs])
+
+    print(f"\n{len(questions)} questions x {args.runs} runs, top {args.k} of {len(lexical.ids)} chunks")
+    print(f"{'mode':10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'rare-term hit':>14}")
+    rare_terms = [rarest_term(question, lexical) for question in questions]
+    for mode in MODES:
+        hits = [
+            any(term in tokenize(text) for text in texts)
+            for term, texts in zip(rare_terms, results[mode]) if term
+        ]
+        hit_rate = f"{sum(hits)}/{len(hits)}" if hits else "n/a"
+        print(f"{mode:10} {statistics.mean(latencies[mode]):9.1f} {percentile(latencies[mode], 50):9.1f} "
+              f"{percentile(latencies[mode], 95):9.1f} {hit_rate:>14}")
+
+    for other in ("vector", "lexical"):
+        overlap = [
+            len(set(hybrid) & set(single)) / max(len(hybrid), 1)
+            for hybrid, single in zip(results["hybrid"], results[other])
+        ]
+        print(f"hybrid top {args.k} shared with {other}: {statistics.mean(overlap):.0%}")
+    print(f"retrieval stats: {retrieval_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from PIL import Image
+
+# Micro-batching for the local disease model. Running images through the
+# model one at a time leaves most of the CPU idle; the batcher groups
+# whatever requests are waiting (up to max_batch, or until max_wait_ms has
+# passed) into one forward pass.
+
+MAX_BATCH = 16
+MAX_WAIT_MS = 15
+
+
+class MicroBatcher:
+    def __init__(self, infer_batch, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        """infer_batch(list_of_inputs) -> list_of_outputs, same length and order."""
+        self.infer_batch = infer_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._run, name="disease-batcher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            # Batch size adapts to load: take whatever is already queued,
+            # and wait up to max_wait for more only while there's room.
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                                 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            inputs = [item for item, _ in batch]
+            try:
+                outputs = self.infer_batch(inputs)
+                for (_, future), output in zip(batch, outputs):
+                    future.set_result(output)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            self.batches += 1
+            self.items += len(batch)
+
+    def submit(self, item):
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items):
+        """Run every item through the batcher; returns (results, images_per_sec)."""
+        start = time.perf_counter()
+        futures = [self.submit(item) for item in items]
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - start
+        return results, (len(items) / elapsed if elapsed > 0 else 0.0)
+
+
+def load_images(files):
+    return [Image.open(f).convert('RGB') for f in files]
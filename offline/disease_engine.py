@@ -0,0 +1,68 @@
+import json
+import os
+
+import numpy as np
+from PIL import Image
+
+# Offline CPU inference for the disease model: a pre-exported, int8-quantized
+# ONNX file (see export_disease_model.py) run with onnxruntime. No network,
+# no torch.hub checkout, and a fraction of the fp32 PyTorch latency.
+
+DISEASE_MODEL_PATH = os.getenv("DISEASE_MODEL_PATH", "models/yolov5s-int8.onnx")
+DISEASE_LABELS_PATH = os.getenv("DISEASE_LABELS_PATH", "models/labels.json")
+DISEASE_THREADS = int(os.getenv("DISEASE_THREADS", str(os.cpu_count() or 1)))
+INPUT_SIZE = 640
+CONF_THRESHOLD = 0.25
+
+
+def letterbox(img, size=INPUT_SIZE, fill=114):
+    """Resize keeping aspect ratio, pad to size x size; returns a CHW float32 array in [0, 1]."""
+    scale = min(size / img.width, size / img.height)
+    resized = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BILINEAR)
+    canvas = Image.new("RGB", (size, size), (fill, fill, fill))
+    canvas.paste(resized, ((size - resized.width) // 2, (size - resized.height) // 2))
+    return np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+
+
+class DiseaseEngine:
+    def __init__(self, model_path=DISEASE_MODEL_PATH, labels_path=DISEASE_LABELS_PATH,
+                 threads=DISEASE_THREADS):
+        for path in (model_path, labels_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(
+                    f"{path} not found. Export the model once (needs network): "
+                    f"pip install -r requirements-export.txt && python export_disease_model.py"
+                )
+
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # One big op at a time, spread across the cores; inter-op parallelism
+        # only adds contention on small edge CPUs.
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        with open(labels_path, encoding="utf-8") as f:
+            self.labels = json.load(f)
+
+    def predict(self, images):
+        """Top label per PIL image ("Healthy" when nothing clears the threshold)."""
+        batch = np.stack([letterbox(img.convert("RGB")) for img in images])
+        output = self.session.run(None, {self.input_name: batch})[0]  # (N, boxes, 5 + classes)
+        labels = []
+        for boxes in output:
+            # score = objectness * class confidence; the best box is the top
+            # detection after NMS too, so NMS isn't needed for a single label.
+            scores = boxes[:, 4:5] * boxes[:, 5:]
+            best_box, best_class = np.unravel_index(np.argmax(scores), scores.shape)
+            if scores[best_box, best_class] < CONF_THRESHOLD:
+                labels.append("Healthy")
+            else:
+                labels.append(self.labels[best_class])
+        return labels
+
+    def detect(self, image):
+        return self.predict([image])[0]
@@ -0,0 +1,81 @@
+"""
+One-time export of the YOLOv5 disease model to an int8 ONNX file for the
+offline CPU engine (disease_engine.py). Needs network and torch only here,
+never on the edge box.
+
+    python export_disease_model.py [--calibration-dir sample_leaves/] [--out models/]
+
+With a calibration folder the model is statically quantized (int8 weights
+and activations, best CPU speed-up for a conv net); without one it falls
+back to dynamic weight-only quantization.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                      quantize_dynamic, quantize_static)
+
+from disease_engine import INPUT_SIZE, letterbox
+
+EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class FolderCalibrationReader(CalibrationDataReader):
+    def __init__(self, folder, input_name, limit=100):
+        paths = sorted(
+            os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith(EXTENSIONS)
+        )[:limit]
+        self._batches = iter(
+            {input_name: letterbox(Image.open(path).convert("RGB"))[np.newaxis]} for path in paths
+        )
+
+    def get_next(self):
+        return next(self._batches, None)
+
+
+def export(out_dir, calibration_dir=None, opset=12):
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path = os.path.join(out_dir, "yolov5s.onnx")
+    int8_path = os.path.join(out_dir, "yolov5s-int8.onnx")
+
+    model = torch.hub.load('ultralytics/yolov5', 'yolov5s', autoshape=False)
+    model.eval()
+    for module in model.modules():
+        if module.__class__.__name__ == "Detect":
+            module.inplace = False
+            module.export = True  # single (N, boxes, 5 + classes) output
+
+    dummy = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE)
+    torch.onnx.export(
+        model, dummy, fp32_path, opset_version=opset,
+        input_names=["images"], output_names=["output"],
+        dynamic_axes={"images": {0: "batch"}, "output": {0: "batch"}},
+    )
+    print(f"✅ Exported fp32 model: {fp32_path}")
+
+    if calibration_dir:
+        quantize_static(
+            fp32_path, int8_path, FolderCalibrationReader(calibration_dir, "images"),
+            quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    else:
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+    print(f"✅ Quantized int8 model: {int8_path}")
+
+    names = model.names if isinstance(model.names, list) else [model.names[i] for i in sorted(model.names)]
+    with open(os.path.join(out_dir, "labels.json"), "w", encoding="utf-8") as f:
+        json.dump(names, f, indent=2)
+    print(f"✅ Wrote {len(names)} class labels")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="models")
+    parser.add_argument("--calibration-dir")
+    args = parser.parse_args()
+    export(args.out, args.calibration_dir)
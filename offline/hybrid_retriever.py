@@ -0,0 +1,237 @@
+import hashlib
+import heapq
+import json
+import math
+import os
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any
+
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from ingest import embed_query
+
+# Hybrid retrieval for the offline RAG: a BM25 index over the same chunks
+# as the Chroma store, fused with vector search by reciprocal rank (RRF).
+# BM25 catches exact pest and chemical names ("imidacloprid", "Helicoverpa")
+# that embeddings blur together; vectors catch paraphrases.
+#
+# The BM25 index is built once from the Chroma collection and kept on disk
+# (rag_index/bm25.json) next to it, keyed by a fingerprint of the chunk ids,
+# so it is only rebuilt when the indexed documents change. It needs no model
+# at query time: when the embedding model is down or slower than
+# RAG_EMBED_TIMEOUT, questions are answered from BM25 alone and the
+# embedder is left alone for RAG_EMBED_RETRY seconds.
+#
+#   RAG_RETRIEVAL     hybrid (default), lexical or vector
+#   RAG_TOP_K         chunks handed to the LLM
+#   RAG_FETCH_K       candidates taken from each side before fusion
+
+RAG_RETRIEVAL = os.getenv("RAG_RETRIEVAL", "hybrid")
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RAG_FETCH_K = int(os.getenv("RAG_FETCH_K", "20"))
+RAG_EMBED_TIMEOUT = float(os.getenv("RAG_EMBED_TIMEOUT", "2.0"))
+RAG_EMBED_RETRY = float(os.getenv("RAG_EMBED_RETRY", "30"))
+RRF_K = 60  # the usual RRF constant: damps the weight of the very top ranks
+
+LEXICAL_INDEX_FILE = "bm25.json"
+LEXICAL_INDEX_VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i", "in",
+    "is", "it", "its", "my", "of", "on", "or", "should", "that", "the", "this", "to", "what", "when",
+    "which", "why", "with", "you", "your",
+}
+
+
+def tokenize(text):
+    """Lowercased words; letters, digits and combining marks kept, so Indic scripts tokenize too."""
+    text = unicodedata.normalize("NFC", text or "").lower()
+    kept = "".join(ch if unicodedata.category(ch)[0] in "LMN" else " " for ch in text)
+    return [token for token in kept.split() if token not in STOPWORDS]
+
+
+def chunk_fingerprint(ids):
+    return hashlib.sha256("\n".join(sorted(ids)).encode("utf-8")).hexdigest()
+
+
+class LexicalIndex:
+    """BM25 over a fixed set of chunks, with an inverted index so a query only touches matching chunks."""
+
+    def __init__(self, ids, texts, metadatas, postings, lengths, fingerprint):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = postings  # term -> [[chunk index, term frequency], ...]
+        self.lengths = lengths
+        self.fingerprint = fingerprint
+        count = len(ids)
+        average = sum(lengths) / count if count else 1.0
+        self._norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / average) for length in lengths]
+        self._idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in postings.items()
+        }
+
+    @classmethod
+    def build(cls, ids, texts, metadatas):
+        postings, lengths = {}, []
+        for index, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append([index, tf])
+        return cls(ids, texts, metadatas, postings, lengths, chunk_fingerprint(ids))
+
+    def search(self, query, k):
+        """[(chunk index, score)] of the k best BM25 matches."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for index, tf in self.postings[term]:
+                scores[index] = scores.get(index, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + self._norms[index])
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def document(self, index):
+        return Document(page_content=self.texts[index], metadata=self.metadatas[index] or {})
+
+    def save(self, path):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "version": LEXICAL_INDEX_VERSION,
+                "fingerprint": self.fingerprint,
+                "ids": self.ids,
+                "texts": self.texts,
+                "metadatas": self.metadatas,
+                "lengths": self.lengths,
+                "postings": self.postings,
+            }, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != LEXICAL_INDEX_VERSION:
+            raise ValueError(f"lexical index version {data.get('version')}")
+        return cls(data["ids"], data["texts"], data["metadatas"], data["postings"], data["lengths"],
+                   data["fingerprint"])
+
+
+def load_or_build_lexical_index(collection, persist_dir):
+    """The BM25 index for the collection's chunks: read from persist_dir, rebuilt only if the chunk set changed."""
+    start = time.perf_counter()
+    path = os.path.join(persist_dir, LEXICAL_INDEX_FILE)
+    fingerprint = chunk_fingerprint(collection.get(include=[])["ids"])
+    try:
+        index = LexicalIndex.load(path)
+        if index.fingerprint == fingerprint:
+            print(f"🔤 BM25 index loaded in {time.perf_counter() - start:.2f}s ({len(index.ids)} chunks)")
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+
+    chunks = collection.get(include=["documents", "metadatas"])
+    index = LexicalIndex.build(chunks["ids"], chunks["documents"], chunks["metadatas"])
+    index.save(path)
+    print(f"🔤 BM25 index built in {time.perf_counter() - start:.2f}s "
+          f"({len(index.ids)} chunks, {len(index.postings)} terms)")
+    return index
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=RRF_K):
+    """Chunk ids ordered by sum of 1 / (rrf_k + rank) over every ranking they appear in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# Query embeddings run on their own small pool so a hung embedding model
+# costs one waiting thread, not the farmer's question.
+_embed_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-embed")
+_stats_lock = threading.Lock()
+_stats = {"hybrid": 0, "lexical": 0, "vector": 0, "embed_timeouts": 0, "embed_errors": 0}
+_embedder_down_until = 0.0
+
+
+def _count(field):
+    with _stats_lock:
+        _stats[field] += 1
+
+
+def retrieval_stats():
+    with _stats_lock:
+        return dict(_stats, embedder_down=time.monotonic() < _embedder_down_until)
+
+
+class HybridRetriever(BaseRetriever):
+    collection: Any
+    embeddings: Any
+    lexical: Any
+    mode: str = RAG_RETRIEVAL
+    k: int = RAG_TOP_K
+    fetch_k: int = RAG_FETCH_K
+    embed_timeout: float = RAG_EMBED_TIMEOUT
+
+    def start_embedding(self, query):
+        """Embed the query in the background; None while the embedding model is marked down."""
+        if time.monotonic() < _embedder_down_until:
+            return None
+        return _embed_pool.submit(embed_query, self.embeddings, query), time.monotonic()
+
+    def vector_search(self, pending, n):
+        """[(chunk id, Document)] from Chroma, or None if the embedding failed or was too slow."""
+        global _embedder_down_until
+        future, started = pending
+        try:
+            vector = future.result(timeout=max(0.0, self.embed_timeout - (time.monotonic() - started)))
+        except FutureTimeout:
+            _count("embed_timeouts")
+            _embedder_down_until = time.monotonic() + RAG_EMBED_RETRY
+            print(f"⚠️ Query embedding took over {self.embed_timeout}s, using BM25 only for {RAG_EMBED_RETRY:.0f}s")
+            return None
+        except Exception as e:
+            _count("embed_errors")
+            _embedder_down_until = time.monotonic() + RAG_EMBED_RETRY
+            print(f"⚠️ Query embedding failed ({e}), using BM25 only for {RAG_EMBED_RETRY:.0f}s")
+            return None
+
+        result = self.collection.query(query_embeddings=[vector], n_results=n,
+                                       include=["documents", "metadatas"])
+        return [
+            (chunk_id, Document(page_content=text, metadata=metadata or {}))
+            for chunk_id, text, metadata in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])
+        ]
+
+    def lexical_search(self, query, n):
+        return [(self.lexical.ids[index], self.lexical.document(index)) for index, _ in self.lexical.search(query, n)]
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        # BM25 runs while the query is being embedded
+        pending = self.start_embedding(query) if self.mode != "lexical" else None
+        lexical = self.lexical_search(query, self.fetch_k) if self.mode != "vector" or pending is None else []
+        vector = self.vector_search(pending, self.fetch_k) if pending is not None else None
+
+        if vector is None:
+            _count("lexical")
+            return [doc for _, doc in (lexical or self.lexical_search(query, self.k))[:self.k]]
+        if self.mode == "vector":
+            _count("vector")
+            return [doc for _, doc in vector[:self.k]]
+
+        _count("hybrid")
+        docs = dict(lexical)
+        docs.update(vector)
+        fused = reciprocal_rank_fusion([[chunk_id for chunk_id, _ in lexical], [chunk_id for chunk_id, _ in vector]])
+        return [docs[chunk_id] for chunk_id in fused[:self.k]]
@@ -0,0 +1,214 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import requests
+from pypdf import PdfReader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+# Ingestion pipeline for the RAG corpus:
+#   PDF pages --(process pool: extract + split)--> chunks
+#     --(bounded queue of batches)--> N embedding threads --> Chroma
+# Parsing runs on every core, Ollama gets several batched requests at once,
+# and the bounded queue keeps memory flat on multi-hundred-page manuals.
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = 8
+QUEUE_BATCHES = 8
+
+
+def _parse_pages(path, pages, chunk_size, chunk_overlap):
+    """Runs in a worker process: extract and split a range of pages."""
+    reader = PdfReader(path)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    results = []
+    for page in pages:
+        text = reader.pages[page].extract_text() or ""
+        doc = Document(page_content=text, metadata={"source": path, "page": page, "total_pages": len(reader.pages)})
+        results.append((page, splitter.split_documents([doc])))
+    return results
+
+
+def page_chunk_ids(path, page, chunks):
+    """Content-derived ids, so unchanged chunks keep their id when a document is edited."""
+    seen = {}
+    ids = []
+    for chunk in chunks:
+        digest = hashlib.sha256(f"{path}\n{page}\n{chunk.page_content}".encode("utf-8")).hexdigest()[:32]
+        count = seen.get(digest, 0)
+        seen[digest] = count + 1
+        ids.append(digest if count == 0 else f"{digest}-{count}")
+    return ids
+
+
+def parse_pdf_parallel(path, pool, chunk_size, chunk_overlap):
+    """Yield (page, chunks, ids) for every page of path as worker processes finish them."""
+    page_count = len(PdfReader(path).pages)
+    futures = [
+        pool.submit(_parse_pages, path, range(start, min(start + PAGES_PER_TASK, page_count)),
+                    chunk_size, chunk_overlap)
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+    for future in as_completed(futures):
+        for page, chunks in future.result():
+            yield page, chunks, page_chunk_ids(path, page, chunks)
+
+
+def normalize(vector):
+    """Unit-length copy of vector (all-zero vectors are returned unchanged)."""
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else list(vector)
+
+
+def _ollama_embed(embeddings, inputs):
+    """Vectors from Ollama's batch /api/embed endpoint, or None if embeddings isn't Ollama or the call failed."""
+    base_url = getattr(embeddings, "base_url", None)
+    model = getattr(embeddings, "model", None)
+    if not (base_url and model):
+        return None
+    try:
+        response = requests.post(f"{base_url}/api/embed", json={"model": model, "input": inputs}, timeout=300)
+        if response.status_code == 200:
+            vectors = response.json().get("embeddings")
+            if vectors and len(vectors) == len(inputs):
+                return vectors
+    except requests.RequestException:
+        pass
+    return None
+
+
+# Chunks and questions must be embedded the same way or their distances mean
+# nothing: /api/embed returns unit vectors, while langchain's per-text calls
+# (old /api/embeddings) don't. So both sides go through /api/embed when it
+# is there, and every vector is L2-normalised whichever path produced it.
+
+def embed_batch(embeddings, texts):
+    """
+    One request for the whole batch. langchain's OllamaEmbeddings sends one
+    HTTP call per text, so for Ollama we use its batch /api/embed endpoint
+    and fall back to embed_documents on older servers.
+    """
+    # Same "passage: " prefix embed_documents would add, so vectors match.
+    instruction = getattr(embeddings, "embed_instruction", "") or ""
+    vectors = _ollama_embed(embeddings, [f"{instruction}{text}" for text in texts])
+    if vectors is None:
+        vectors = embeddings.embed_documents(texts)
+    return [normalize(vector) for vector in vectors]
+
+
+def embed_query(embeddings, text):
+    """The question's vector, made exactly like embed_batch makes chunk vectors."""
+    instruction = getattr(embeddings, "query_instruction", "") or ""
+    vectors = _ollama_embed(embeddings, [f"{instruction}{text}"])
+    return normalize(vectors[0] if vectors is not None else embeddings.embed_query(text))
+
+
+class EmbeddingWriter:
+    """Bounded queue of chunk batches drained by several embedding threads into a Chroma collection."""
+
+    def __init__(self, collection, embeddings, batch_size=EMBED_BATCH_SIZE, concurrency=EMBED_CONCURRENCY,
+                 max_queued=QUEUE_BATCHES):
+        self.collection = collection
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._pending = []
+        self._write_lock = threading.Lock()
+        self._errors = []
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"embed-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _worker(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            ids, docs = batch
+            try:
+                vectors = embed_batch(self.embeddings, [doc.page_content for doc in docs])
+                with self._write_lock:
+                    self.collection.upsert(
+                        ids=ids,
+                        embeddings=vectors,
+                        documents=[doc.page_content for doc in docs],
+                        metadatas=[doc.metadata for doc in docs],
+                    )
+                    self.chunks += len(ids)
+            except Exception as e:
+                self._errors.append(e)
+
+    def add(self, ids, docs):
+        """Queue chunks for embedding; blocks when the queue is full (backpressure)."""
+        for chunk_id, doc in zip(ids, docs):
+            self._pending.append((chunk_id, doc))
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if self._pending:
+            ids, docs = zip(*self._pending)
+            self._pending = []
+            self._queue.put((list(ids), list(docs)))
+
+    def close(self):
+        """Flush, wait for every batch to be written and return throughput stats."""
+        self._flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise RuntimeError(f"{len(self._errors)} embedding batches failed: {self._errors[0]}")
+        elapsed = time.perf_counter() - self.started
+        return {
+            "chunks": self.chunks,
+            "seconds": round(elapsed, 2),
+            "chunks_per_sec": round(self.chunks / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+def make_parse_pool(workers=PARSE_WORKERS):
+    # spawn, not the Linux default fork: the parent has Streamlit, Chroma and
+    # embedding threads running, and forking a threaded process can deadlock
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+if __name__ == "__main__":
+    import argparse
+    from langchain_community.embeddings import OllamaEmbeddings
+    from vector_index import load_or_build_index, INDEX_DIR
+    from hybrid_retriever import load_or_build_lexical_index
+
+    parser = argparse.ArgumentParser(description="Build or update the offline RAG index and report throughput.")
+    parser.add_argument("pdfs", nargs="+")
+    parser.add_argument("--embed-model", default="nomic-embed-text")
+    parser.add_argument("--persist-dir", default=INDEX_DIR)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY)
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    args = parser.parse_args()
+
+    collection = load_or_build_index(
+        args.pdfs,
+        OllamaEmbeddings(model=args.embed_model),
+        args.embed_model,
+        persist_dir=args.persist_dir,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        parse_workers=args.parse_workers,
+    )
+    load_or_build_lexical_index(collection, args.persist_dir)
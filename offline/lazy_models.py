@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+# Heavy components of the offline app, each loaded on first use instead of
+# all at once before the UI renders. Components listed in OFFLINE_PREWARM
+# are also loaded in background threads right after startup, so they are
+# usually ready by the time the farmer asks for them.
+
+OFFLINE_PREWARM = [
+    name.strip() for name in os.getenv("OFFLINE_PREWARM", "qa_chain,disease,translator,recognizer").split(",")
+    if name.strip()
+]
+
+
+class LazyModel:
+    """
+    not_loaded -> loading -> ready | failed
+    get() loads on the calling thread if nobody has started yet, otherwise
+    waits for the loading thread; a failed load is retried on the next get().
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self.state = "not_loaded"
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    print(f"❌ Failed to load {self.name}: {e}")
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 2)
+                self.error = None
+                self.state = "ready"
+                print(f"✅ {self.name} ready in {self.load_seconds}s")
+        return self._value
+
+    def warm(self):
+        """Start loading in a background thread; returns immediately."""
+        if self.state in ("not_loaded", "failed"):
+            threading.Thread(target=self._warm, name=f"warm-{self.name}", daemon=True).start()
+
+    def _warm(self):
+        try:
+            self.get()
+        except Exception:
+            pass  # already logged; the next get() retries
+
+    def snapshot(self):
+        return {"state": self.state, "seconds": self.load_seconds, "error": self.error}
+
+
+class ModelRegistry:
+    def __init__(self, loaders):
+        self.models = {name: LazyModel(name, loader) for name, loader in loaders.items()}
+
+    def __getitem__(self, name):
+        return self.models[name]
+
+    def get(self, name):
+        return self.models[name].get()
+
+    def prewarm(self, names=None):
+        for name in OFFLINE_PREWARM if names is None else names:
+            if name in self.models:
+                self.models[name].warm()
+
+    def status(self):
+        return {name: model.snapshot() for name, model in self.models.items()}
@@ -1,49 +1,99 @@
 import os
+import glob
 import streamlit as st
 from PIL import Image
 import numpy as np
-import torch
-from torchvision import transforms
-import speech_recognition as sr
 from audio_recorder_streamlit import audio_recorder
 import tempfile
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_community.llms import Ollama
-from langchain.chains import RetrievalQA
-from googletrans import Translator
+from disease_batch import MicroBatcher, load_images
+from lazy_models import ModelRegistry
+
+EMBED_MODEL = "nomic-embed-text"
+# farming_threats.pdf plus any extra manuals dropped into knowledge/
+KNOWLEDGE_PDFS = ['farming_threats.pdf'] + sorted(glob.glob('knowledge/*.pdf'))
 
 # Custom CSS Styling
 def local_css(file_name):
     with open(file_name) as f:
         st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
 
-# Initialize models
+# Model loaders: heavy imports live inside them so the UI renders first
+def load_qa_chain():
+    # RAG System (persisted on disk, only changed documents are re-embedded)
+    from langchain_community.embeddings import OllamaEmbeddings
+    from langchain_community.llms import Ollama
+    from langchain.chains import RetrievalQA
+    from vector_index import load_or_build_index, INDEX_DIR
+    from hybrid_retriever import HybridRetriever, load_or_build_lexical_index
+
+    embeddings = OllamaEmbeddings(model=EMBED_MODEL)
+    collection = load_or_build_index(KNOWLEDGE_PDFS, embeddings, EMBED_MODEL, chunk_size=1000, chunk_overlap=200)
+    # BM25 + vectors fused by rank; BM25 alone if the embedding model is down or slow
+    lexical = load_or_build_lexical_index(collection, INDEX_DIR)
+    llm = Ollama(model="gemma3:1b", temperature=0.7)
+    return RetrievalQA.from_chain_type(llm, retriever=HybridRetriever(collection=collection, embeddings=embeddings, lexical=lexical))
+
+def load_disease_model():
+    # Disease Detection Model (int8 ONNX on CPU, exported by export_disease_model.py)
+    from disease_engine import DiseaseEngine
+
+    disease_engine = DiseaseEngine()
+    return disease_engine, MicroBatcher(disease_engine.predict)
+
+def load_translator():
+    from googletrans import Translator
+    return Translator()
+
+def load_recognizer():
+    import speech_recognition as sr
+    return sr.Recognizer()
+
+MODEL_LABELS = {
+    "qa_chain": "Knowledge base & LLM",
+    "disease": "Disease model",
+    "translator": "Translator",
+    "recognizer": "Speech recognizer",
+}
+
+# Initialize models: nothing is loaded here, components load on first use
+# or in the background (see OFFLINE_PREWARM in lazy_models.py)
 @st.cache_resource
 def setup_models():
-    # RAG System
-    loader = PyPDFLoader('farming_threats.pdf')
-    docs = loader.load()
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    documents = text_splitter.split_documents(docs)
-    embeddings = OllamaEmbeddings(model="nomic-embed-text")
-    db = Chroma.from_documents(documents, embeddings)
-    llm = Ollama(model="gemma3:1b", temperature=0.7)
-    qa_chain = RetrievalQA.from_chain_type(llm, retriever=db.as_retriever())
-    
-    # Disease Detection Model
-    disease_model = torch.hub.load('ultralytics/yolov5', 'yolov5s')
-    transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.ToTensor()
-    ])
-    
-    return qa_chain, disease_model, transform
+    models = ModelRegistry({
+        "qa_chain": load_qa_chain,
+        "disease": load_disease_model,
+        "translator": load_translator,
+        "recognizer": load_recognizer,
+    })
+    models.prewarm()
+    return models
+
+def use_model(models, name):
+    """Get a component, with a spinner if the farmer has to wait for it to load."""
+    try:
+        if models[name].state == "ready":
+            return models.get(name)
+        with st.spinner(f"Loading {MODEL_LABELS[name].lower()}..."):
+            return models.get(name)
+    except Exception as e:
+        st.error(f"❌ {MODEL_LABELS[name]} failed to load: {e}")
+        st.stop()
+
+def show_model_status(models):
+    icons = {"ready": "✅", "loading": "⏳", "not_loaded": "💤", "failed": "❌"}
+    st.sidebar.markdown("### Model status")
+    for name, status in models.status().items():
+        detail = {
+            "ready": f"ready in {status['seconds']}s",
+            "loading": "loading...",
+            "not_loaded": "loads on first use",
+            "failed": status["error"],
+        }[status["state"]]
+        st.sidebar.caption(f"{icons[status['state']]} {MODEL_LABELS[name]}: {detail}")
+    st.sidebar.button("🔄 Refresh status")
 
 # Translation function
-def translate_text(text, dest_lang):
+def translate_text(text, dest_lang, translator):
     lang_map = {
         "English": "en",
         "Tamil": "ta",
@@ -51,7 +101,6 @@ def translate_text(text, dest_lang):
         "Telugu": "te"
     }
     try:
-        translator = Translator()
         translated = translator.translate(text, dest=lang_map[dest_lang])
         return translated.text
     except Exception as e:
@@ -59,13 +108,14 @@ def translate_text(text, dest_lang):
         return text
 
 # Voice transcription
-def transcribe_audio(audio_bytes):
+def transcribe_audio(audio_bytes, r):
+    import speech_recognition as sr
+
     try:
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as fp:
             fp.write(audio_bytes)
             audio_path = fp.name
         
-        r = sr.Recognizer()
         with sr.AudioFile(audio_path) as source:
             audio = r.record(source)
 
@@ -81,12 +131,13 @@ def transcribe_audio(audio_bytes):
         return None, "English"
 
 # Disease detection
-def detect_disease(image, model, transform):
+def detect_disease(image, engine):
     img = Image.open(image).convert('RGB')
-    img_t = transform(img).unsqueeze(0)
-    results = model(img_t)
-    predictions = results.pandas().xyxy[0]
-    return predictions['name'][0] if len(predictions) > 0 else "Healthy"
+    return engine.detect(img)
+
+# Field survey: many photos through the model in micro-batches
+def detect_diseases(images, batcher):
+    return batcher.map(load_images(images))
 
 # Main App
 def main():
@@ -101,8 +152,9 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Initialize models
-    qa_chain, disease_model, transform = setup_models()
+    # Initialize models (lazy; loading continues in the background)
+    models = setup_models()
+    show_model_status(models)
     
     # User selection
     col1, col2 = st.columns(2)
@@ -128,20 +180,35 @@ def main():
         audio_bytes = audio_recorder(pause_threshold=2.0)
         if audio_bytes:
             with st.spinner("Processing your voice..."):
-                question, detected_lang = transcribe_audio(audio_bytes)
+                question, detected_lang = transcribe_audio(audio_bytes, use_model(models, "recognizer"))
                 if question:
                     st.text_area("Your question:", value=question, height=100)
     else:
-        uploaded_file = st.file_uploader("Upload plant image:", type=["jpg", "png", "jpeg"])
-        if uploaded_file:
+        uploaded_files = st.file_uploader("Upload plant image(s):", type=["jpg", "png", "jpeg"],
+                                          accept_multiple_files=True)
+        if len(uploaded_files) == 1:
+            uploaded_file = uploaded_files[0]
             st.image(uploaded_file, caption="Your Plant", use_column_width=True)
             if st.button("Analyze Plant"):
+                disease_engine, _ = use_model(models, "disease")
                 with st.spinner("Diagnosing..."):
-                    disease = detect_disease(uploaded_file, disease_model, transform)
+                    disease = detect_disease(uploaded_file, disease_engine)
                     st.success(f"Diagnosis: {disease}")
+        elif uploaded_files:
+            st.caption(f"📋 {len(uploaded_files)} photos selected for a field survey")
+            if st.button("Analyze All Plants"):
+                _, disease_batcher = use_model(models, "disease")
+                with st.spinner("Diagnosing..."):
+                    diagnoses, images_per_sec = detect_diseases(uploaded_files, disease_batcher)
+                st.table([
+                    {"Photo": f.name, "Diagnosis": disease}
+                    for f, disease in zip(uploaded_files, diagnoses)
+                ])
+                st.caption(f"⚡ {images_per_sec:.1f} images/sec")
     
     # Get Answer
     if question and st.button("Get Answer", type="primary"):
+        qa_chain = use_model(models, "qa_chain")
         with st.spinner("Generating answer..."):
             try:
                 # Get response
@@ -150,7 +217,7 @@ def main():
                 # Translate if needed
                 display_lang = detected_lang if detected_lang != "English" else language
                 if display_lang != "English":
-                    response = translate_text(response, display_lang)
+                    response = translate_text(response, display_lang, use_model(models, "translator"))
                 
                 # Display answer
                 st.markdown(f"""
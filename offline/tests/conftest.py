@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The offline modules import each other as top-level modules (rag.py is run from offline/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,76 @@
+from hybrid_retriever import LexicalIndex, chunk_fingerprint, reciprocal_rank_fusion, tokenize
+
+IDS = ["borer", "whitefly", "blight"]
+TEXTS = [
+    "Stem borer in paddy: release Trichogramma cards and spray chlorantraniliprole.",
+    "Whitefly on cotton spreads leaf curl. Spray imidacloprid or neem oil on the undersides of the leaves.",
+    "Late blight on potato and tomato: dark water-soaked spots on the leaves; spray mancozeb.",
+]
+METADATAS = [{"page": 1}, {"page": 2}, None]
+
+
+def build():
+    return LexicalIndex.build(IDS, TEXTS, METADATAS)
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is the dose of Imidacloprid?") == ["dose", "imidacloprid"]
+
+
+def test_tokenize_keeps_indic_vowel_signs():
+    assert tokenize("மிளகாய் இலை, சுருள்!") == ["மிளகாய்", "இலை", "சுருள்"]
+
+
+def test_rare_term_finds_its_chunk():
+    index = build()
+    results = index.search("dose of imidacloprid", 3)
+    assert [IDS[i] for i, _ in results] == ["whitefly"]
+
+
+def test_scores_rank_more_matching_chunks_first():
+    index = build()
+    results = index.search("spray on leaves of tomato", 3)
+    assert IDS[results[0][0]] == "blight"
+    assert len(results) == 3
+    assert results[0][1] > results[1][1] >= results[2][1]
+
+
+def test_unknown_terms_match_nothing():
+    assert build().search("tractor loan", 3) == []
+
+
+def test_document_metadata_defaults_to_empty():
+    index = build()
+    assert index.document(1).metadata == {"page": 2}
+    assert index.document(2).metadata == {}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = build()
+    path = str(tmp_path / "bm25.json")
+    index.save(path)
+    loaded = LexicalIndex.load(path)
+    assert loaded.fingerprint == chunk_fingerprint(IDS)
+    assert loaded.search("imidacloprid whitefly", 3) == index.search("imidacloprid whitefly", 3)
+
+
+def test_fingerprint_ignores_order():
+    assert chunk_fingerprint(["a", "b"]) == chunk_fingerprint(["b", "a"])
+    assert chunk_fingerprint(["a", "b"]) != chunk_fingerprint(["a", "c"])
+
+
+def test_rrf_favours_chunks_found_by_both_rankings():
+    fused = reciprocal_rank_fusion([["x", "both", "y"], ["z", "both"]])
+    assert fused[0] == "both"
+    assert set(fused) == {"x", "y", "z", "both"}
+
+
+def test_rrf_ties_keep_first_seen_order():
+    assert reciprocal_rank_fusion([["a", "b"], ["c", "d"]]) == ["a", "c", "b", "d"]
+
+
+def test_rrf_constant_damps_top_ranks():
+    # with a small k, first place outweighs appearing twice lower down
+    rankings = [["top", "a", "b", "shared"], ["c", "d", "e", "shared"]]
+    assert reciprocal_rank_fusion(rankings, rrf_k=1)[0] == "top"
+    assert reciprocal_rank_fusion(rankings, rrf_k=60)[0] == "shared"
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import chromadb
+
+from ingest import (EmbeddingWriter, make_parse_pool, parse_pdf_parallel,
+                    EMBED_BATCH_SIZE, EMBED_CONCURRENCY, PARSE_WORKERS)
+
+# Persistent Chroma index for the offline RAG. Embedding every chunk through
+# Ollama takes minutes on the edge boxes, so the index lives on disk next to
+# a manifest of what went into it, and a cold start only re-embeds what
+# actually changed.
+
+INDEX_DIR = "rag_index"
+COLLECTION = "farming_docs"
+MANIFEST = "manifest.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(persist_dir):
+    try:
+        with open(os.path.join(persist_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(persist_dir, manifest):
+    path = os.path.join(persist_dir, MANIFEST)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def open_collection(persist_dir=INDEX_DIR):
+    """
+    The Chroma collection stored in persist_dir. Chroma gets no embedding
+    function of its own: chunk and query vectors always come from
+    ingest.embed_batch / ingest.embed_query, so both are made the same way.
+    """
+    client = chromadb.PersistentClient(path=persist_dir)
+    return client.get_or_create_collection(COLLECTION, embedding_function=None)
+
+
+def load_or_build_index(pdf_paths, embeddings, embed_model, persist_dir=INDEX_DIR,
+                        chunk_size=1000, chunk_overlap=200, batch_size=EMBED_BATCH_SIZE,
+                        concurrency=EMBED_CONCURRENCY, parse_workers=PARSE_WORKERS):
+    """
+    Open the on-disk Chroma index, bring it in line with pdf_paths and
+    return its collection.
+
+    - same PDFs (by SHA-256) and chunking settings: reused as-is, nothing embedded
+    - a PDF changed: only its new chunks are embedded, vanished chunks deleted
+    - a PDF removed: its chunks are deleted
+    - chunking settings or embedding model changed: rebuilt from scratch
+
+    New chunks go through the ingest pipeline (parallel page parsing,
+    batched concurrent embedding).
+    """
+    start = time.perf_counter()
+    settings = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap, "embed_model": embed_model,
+                "chunk_ids": "page-v2", "vectors": "l2-normalized"}
+    manifest = _read_manifest(persist_dir)
+    if manifest.get("settings") != settings:
+        if os.path.isdir(persist_dir):
+            shutil.rmtree(persist_dir)
+        manifest = {"settings": settings, "sources": {}}
+    os.makedirs(persist_dir, exist_ok=True)
+
+    collection = open_collection(persist_dir)
+    sources = manifest["sources"]
+    removed = 0
+
+    for path in list(sources):
+        if path not in pdf_paths or not os.path.exists(path):
+            stale = sources.pop(path)["ids"]
+            if stale:
+                collection.delete(ids=stale)
+            removed += len(stale)
+            _write_manifest(persist_dir, manifest)
+
+    changed = []
+    for path in pdf_paths:
+        if not os.path.exists(path):
+            print(f"⚠️ RAG source not found: {path}")
+            continue
+        digest = file_sha256(path)
+        entry = sources.get(path)
+        if not entry or entry["sha256"] != digest:
+            changed.append((path, digest, set(entry["ids"]) if entry else set()))
+
+    stats = {"chunks": 0, "chunks_per_sec": 0.0}
+    if changed:
+        writer = EmbeddingWriter(collection, embeddings, batch_size=batch_size, concurrency=concurrency)
+        with make_parse_pool(parse_workers) as pool:
+            for path, digest, old_ids in changed:
+                pages = {}
+                for page, chunks, ids in parse_pdf_parallel(path, pool, chunk_size, chunk_overlap):
+                    pages[page] = ids
+                    fresh = [(chunk_id, chunk) for chunk_id, chunk in zip(ids, chunks) if chunk_id not in old_ids]
+                    if fresh:
+                        writer.add([chunk_id for chunk_id, _ in fresh], [chunk for _, chunk in fresh])
+
+                ids = [chunk_id for page in sorted(pages) for chunk_id in pages[page]]
+                stale = list(old_ids - set(ids))
+                if stale:
+                    collection.delete(ids=stale)
+                removed += len(stale)
+                sources[path] = {"sha256": digest, "ids": ids}
+        stats = writer.close()
+
+    # Only written once every queued chunk is stored, so an interrupted
+    # build is redone rather than leaving the manifest ahead of the index.
+    _write_manifest(persist_dir, manifest)
+    print(f"📚 RAG index ready in {time.perf_counter() - start:.1f}s "
+          f"({stats['chunks']} chunks embedded at {stats['chunks_per_sec']} chunks/sec, "
+          f"{removed} removed, {len(sources)} documents)")
+    return collection